@@ -7,7 +7,6 @@ Machine Learning Classes - University Carlos III of Madrid
 
 import pygame, sys, time, random, math
 from collections import deque
-from wekaI import Weka
 
 
 # DIFFICULTY settings
@@ -18,6 +17,11 @@ from wekaI import Weka
 # Impossible->  120
 DIFFICULTY = 1500
 
+# Model exported with native_model.py (e.g. "./j48.json") to play without
+# a JVM; None uses Weka and MODEL below
+NATIVE_MODEL = None
+MODEL = "./multimore.model"
+
 # Window size
 FRAME_SIZE_X = 480
 FRAME_SIZE_Y = 480
@@ -287,8 +291,13 @@ game_window = pygame.display.set_mode((FRAME_SIZE_X, FRAME_SIZE_Y))
 # FPS (frames per second) controller
 fps_controller = pygame.time.Clock()
 
-weka = Weka()
-weka.start_jvm()
+if NATIVE_MODEL:
+    from native_model import load_native
+    native = load_native(NATIVE_MODEL)
+else:
+    from wekaI import Weka
+    weka = Weka()
+    weka.start_jvm()
 
 
 prev_game_state = None
@@ -356,7 +365,10 @@ while True:
     ]
 
 
-    predicted_action = weka.predict("./multimore.model", x, "./training_keyboard.arff")
+    if NATIVE_MODEL:
+        predicted_action = native.predict(x)
+    else:
+        predicted_action = weka.predict(MODEL, x, "./training_keyboard.arff")
 
     if is_valid_move(game.direction, predicted_action):
         game.direction = predicted_action
@@ -0,0 +1,253 @@
+"""
+Snake Eater ARFF reader
+Streams ARFF files into typed NumPy columns, with a memory-mapped cache
+Machine Learning Classes - University Carlos III of Madrid
+
+Usage (from the practice-1 folder):
+    python arff_reader.py training_keyboard.arff test_keyboard.arff
+
+Numeric attributes become float64 columns (NaN for '?'). Nominal ones
+become int16 codes into the attribute's value list (-1 for '?'). The
+@data section is parsed in chunks of rows, so memory stays bounded by the
+columns themselves.
+
+The first load writes FILE.arff.cache next to the source: a header with
+the source's size and modification time, then every column as raw
+aligned bytes. Later loads map those columns straight from the cache. The
+cache is rebuilt whenever the source file changes.
+"""
+import argparse
+import csv
+import json
+import os
+import struct
+import tempfile
+import time
+
+import numpy as np
+
+CACHE_MAGIC = b'SNAKEARF'
+CACHE_VERSION = 1
+# magic, version, length of the JSON header that follows
+CACHE_HEADER = struct.Struct('<8sII')
+ALIGN = 64
+
+
+class Dataset:
+    def __init__(self, relation, attributes, columns):
+        # attributes: (name, values) pairs, values None for numeric ones
+        # columns: one array per attribute
+        self.relation = relation
+        self.attributes = attributes
+        self.columns = columns
+        self.names = [name for name, _ in attributes]
+        self.n_rows = len(columns[0]) if columns else 0
+
+    def __len__(self):
+        return self.n_rows
+
+    def column(self, name):
+        return self.columns[self.names.index(name)]
+
+    def is_nominal(self, i):
+        return self.attributes[i][1] is not None
+
+    def labels(self, i):
+        # Nominal column i as its value strings
+        values = np.array(self.attributes[i][1] + ['?'], dtype=object)
+        return values[self.columns[i]]
+
+
+def _split(line):
+    # One @data line -> values; quoted values may contain commas
+    if "'" in line or '"' in line:
+        quote = "'" if "'" in line else '"'
+        return [v.strip() for v in next(csv.reader([line], quotechar=quote, skipinitialspace=True))]
+    return [v.strip() for v in line.split(',')]
+
+
+def _parse_attribute(line):
+    # "@attribute name numeric" / "@attribute name {a,b,c}"
+    rest = line.split(None, 1)[1].strip()
+    if rest[0] in "'\"":
+        end = rest.index(rest[0], 1)
+        name, kind = rest[1:end], rest[end + 1:].strip()
+    else:
+        name, kind = rest.split(None, 1)
+    if kind.startswith('{'):
+        return name, _split(kind.strip()[1:-1])
+    if kind.lower() in ('numeric', 'real', 'integer'):
+        return name, None
+    raise ValueError(f"unsupported ARFF attribute type {kind!r} for {name}")
+
+
+def read_header(f):
+    # Reads up to and including @data; returns (relation, attributes)
+    relation, attributes = None, []
+    for line in f:
+        line = line.strip()
+        if not line or line.startswith('%'):
+            continue
+        keyword = line.split(None, 1)[0].lower()
+        if keyword == '@relation':
+            relation = line.split(None, 1)[1].strip().strip("'\"")
+        elif keyword == '@attribute':
+            attributes.append(_parse_attribute(line))
+        elif keyword == '@data':
+            return relation, attributes
+        else:
+            raise ValueError(f"unexpected ARFF header line {line!r}")
+    raise ValueError("ARFF file has no @data section")
+
+
+def _convert(values, attribute):
+    # One chunk of one column as a typed array
+    name, nominal = attribute
+    if nominal is None:
+        try:
+            return np.array(values, dtype=np.float64)
+        except ValueError:
+            return np.array([np.nan if v == '?' else float(v) for v in values], dtype=np.float64)
+    codes = {v: i for i, v in enumerate(nominal)}
+    codes['?'] = -1
+    try:
+        return np.array([codes[v] for v in values], dtype=np.int16)
+    except KeyError as e:
+        raise ValueError(f"value {e.args[0]!r} is not one of the values of {name}") from None
+
+
+def read_arff(filename, chunk_rows=65536):
+    # Parses filename without any cache
+    with open(filename) as f:
+        relation, attributes = read_header(f)
+        chunks = [[] for _ in attributes]
+        rows = []
+
+        def flush():
+            for j, values in enumerate(zip(*rows)):
+                chunks[j].append(_convert(values, attributes[j]))
+            rows.clear()
+
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('%'):
+                continue
+            if line.startswith('{'):
+                raise ValueError("sparse ARFF data is not supported")
+            row = _split(line)
+            if len(row) != len(attributes):
+                raise ValueError(f"{filename}: row has {len(row)} values, expected {len(attributes)}")
+            rows.append(row)
+            if len(rows) == chunk_rows:
+                flush()
+        if rows:
+            flush()
+    empty = [np.empty(0, dtype=np.float64 if values is None else np.int16)
+             for _, values in attributes]
+    columns = [np.concatenate(c) if c else e for c, e in zip(chunks, empty)]
+    return Dataset(relation, attributes, columns)
+
+
+def cache_path(filename):
+    return filename + '.cache'
+
+
+def _source_key(filename):
+    st = os.stat(filename)
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+def save_cache(filename, dataset, source):
+    # Header JSON, then each column at an ALIGN-byte boundary; written to a
+    # temporary file and renamed, like the Q-table checkpoints
+    layout, offset = [], 0
+    for column in dataset.columns:
+        offset += -offset % ALIGN
+        layout.append({'dtype': column.dtype.str, 'offset': offset})
+        offset += column.nbytes
+    meta = json.dumps({'source': source, 'relation': dataset.relation,
+                       'attributes': dataset.attributes, 'n_rows': dataset.n_rows,
+                       'columns': layout}).encode('utf-8')
+    start = CACHE_HEADER.size + len(meta)
+    start += -start % ALIGN
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, tmp = tempfile.mkstemp(prefix='.arff-', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(CACHE_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, len(meta)) + meta)
+            for column, entry in zip(dataset.columns, layout):
+                f.seek(start + entry['offset'])
+                f.write(np.ascontiguousarray(column).data)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, filename)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def load_cache(filename, source=None):
+    # The cached dataset with memory-mapped columns, or None if the cache is
+    # missing, unreadable or was built from a different source file
+    try:
+        with open(filename, 'rb') as f:
+            magic, version, size = CACHE_HEADER.unpack(f.read(CACHE_HEADER.size))
+            meta = json.loads(f.read(size).decode('utf-8'))
+    except (OSError, struct.error, ValueError):
+        return None
+    if magic != CACHE_MAGIC or version != CACHE_VERSION:
+        return None
+    if source is not None and meta['source'] != source:
+        return None
+    start = CACHE_HEADER.size + size
+    start += -start % ALIGN
+    n_rows = meta['n_rows']
+    # A cache cut short (e.g. by an interrupted copy) is rebuilt, not mapped
+    end = max((start + entry['offset'] + n_rows * np.dtype(entry['dtype']).itemsize
+               for entry in meta['columns']), default=start)
+    if os.path.getsize(filename) < end:
+        return None
+    columns = []
+    for entry in meta['columns']:
+        if n_rows == 0:
+            columns.append(np.empty(0, dtype=entry['dtype']))
+        else:
+            columns.append(np.memmap(filename, dtype=entry['dtype'], mode='r',
+                                     offset=start + entry['offset'], shape=(n_rows,)))
+    attributes = [(name, values) for name, values in meta['attributes']]
+    return Dataset(meta['relation'], attributes, columns)
+
+
+def load_arff(filename, cache=True, chunk_rows=65536):
+    # Dataset of filename, from its cache when the cache is up to date
+    if not cache:
+        return read_arff(filename, chunk_rows)
+    source = _source_key(filename)
+    dataset = load_cache(cache_path(filename), source)
+    if dataset is None:
+        dataset = read_arff(filename, chunk_rows)
+        try:
+            save_cache(cache_path(filename), dataset, source)
+        except OSError:
+            pass  # read-only folder: just parse every time
+    return dataset
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load ARFF files into NumPy columns.")
+    parser.add_argument('files', nargs='+', help="ARFF files")
+    parser.add_argument('--no-cache', action='store_true', help="parse without the .cache file")
+    args = parser.parse_args(argv)
+    for filename in args.files:
+        start = time.perf_counter()
+        dataset = load_arff(filename, cache=not args.no_cache)
+        elapsed = time.perf_counter() - start
+        print(f"{filename}: {dataset.n_rows} rows, {len(dataset.attributes)} attributes "
+              f"in {elapsed * 1000:.1f} ms")
+        for (name, values), column in zip(dataset.attributes, dataset.columns):
+            kind = f"{{{','.join(values)}}}" if values is not None else 'numeric'
+            print(f"  {name:<24} {kind:<16} {column.dtype}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The practice-1 modules import each other by flat name, as when the
+# scripts are run from the practice-1 folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,49 @@
+"""
+ARFF reader cache
+
+A cache that is missing, stale or cut short must be rebuilt from the ARFF
+file, never mapped.
+"""
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from arff_reader import cache_path, load_arff, read_arff
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture
+def weather(tmp_path):
+    filename = str(tmp_path / 'weather.arff')
+    shutil.copyfile(os.path.join(HERE, 'data', 'weather.arff'), filename)
+    return filename
+
+
+def assert_same(dataset, expected):
+    assert dataset.attributes == expected.attributes
+    for column, expected_column in zip(dataset.columns, expected.columns):
+        np.testing.assert_array_equal(column, expected_column)
+
+
+def test_cache_round_trip(weather):
+    parsed = read_arff(weather)
+    load_arff(weather)
+    assert os.path.exists(cache_path(weather))
+    cached = load_arff(weather)
+    assert isinstance(cached.columns[1], np.memmap)
+    assert_same(cached, parsed)
+
+
+@pytest.mark.parametrize('cut', [1, 100, 'header'])
+def test_truncated_cache_is_rebuilt(weather, cut):
+    parsed = read_arff(weather)
+    load_arff(weather)
+    cache = cache_path(weather)
+    size = os.path.getsize(cache)
+    with open(cache, 'r+b') as f:
+        f.truncate(10 if cut == 'header' else size - cut)
+    assert_same(load_arff(weather), parsed)
+    assert os.path.getsize(cache) == size
@@ -0,0 +1,187 @@
+"""
+Native J48 and NaiveBayes models against recorded Weka output
+
+data/weka_models.json was recorded with Weka 3.9 (python-weka-wrapper3):
+    - for J48 (default and -B) and NaiveBayes trained on data/weather.arff,
+      and for the j48.model / naivebayes.model of this folder: the
+      attribute list, the model description (str(classifier)) and Weka's
+      prediction for every instance of the ARFF file (test_keyboard.arff
+      for the saved models);
+    - for a few weka.estimators.NormalEstimator: the mean, standard
+      deviation and getProbability(x) at several points.
+A fake Weka object replays that output, so no JVM is needed.
+"""
+import json
+import os
+
+import pytest
+
+from arff_reader import load_arff
+from native_model import (MIN_AGREEMENT, MODELS, _normal_bin, check, export_model,
+                          parse_j48, parse_naive_bayes)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PRACTICE_1 = os.path.dirname(HERE)
+with open(os.path.join(HERE, 'data', 'weka_models.json')) as f:
+    FIXTURES = json.load(f)
+MODEL_FIXTURES = {m['name']: m for m in FIXTURES['models']}
+
+
+class FakeAttribute:
+    def __init__(self, attribute):
+        self.name = attribute['name']
+        self.values = attribute['values']
+        self.is_nominal = self.values is not None
+        self.num_values = len(self.values) if self.is_nominal else 0
+
+    def value(self, j):
+        return self.values[j]
+
+
+class FakeInstance:
+    def __init__(self, values):
+        self.values = values
+
+    def get_value(self, j):
+        return self.values[j]
+
+
+class FakeInstances:
+    # Nominal values are their index, as in weka.core.Instance
+    def __init__(self, attributes, dataset):
+        self.attributes = [FakeAttribute(a) for a in attributes]
+        self.num_attributes = len(attributes)
+        self.num_instances = len(dataset)
+        self.columns = [[float(v) for v in column] for column in dataset.columns]
+
+    def attribute(self, i):
+        return self.attributes[i]
+
+    def get_instance(self, i):
+        return FakeInstance([column[i] for column in self.columns])
+
+
+class FakeClassifier:
+    def __init__(self, classname, description):
+        self.classname = classname
+        self.description = description
+
+    def __str__(self):
+        return self.description
+
+
+class FakeWeka:
+    # Stands in for wekaI.Weka with the recorded output of one model
+    def __init__(self, fixture):
+        self.fixture = fixture
+        self.data = FakeInstances(fixture['attributes'],
+                                  load_arff(os.path.join(PRACTICE_1, fixture['arff']), cache=False))
+
+    def load_header(self, arffName):
+        return self.data
+
+    def load_arff(self, arffName):
+        return self.data
+
+    def load_model(self, modelName):
+        return FakeClassifier(self.fixture['classname'], self.fixture['description'])
+
+    def predict_arff(self, modelName, arffName):
+        return self.fixture['predictions'], None
+
+
+def native(fixture):
+    model = export_model(FakeWeka(fixture), 'model', fixture['arff'])
+    return MODELS[model['type']](model)
+
+
+def feature_attributes(fixture):
+    return fixture['attributes'][:-1]
+
+
+def count_leaves(node):
+    if 'leaf' in node:
+        return 1
+    return sum(count_leaves(child) for child in node['children'])
+
+
+def test_j48_nominal_and_numeric_splits():
+    fixture = MODEL_FIXTURES['weather_j48']
+    tree = parse_j48(fixture['description'], feature_attributes(fixture))
+    assert tree['split'] == 'nominal' and tree['attribute'] == 0
+    assert tree['values'] == ['sunny', 'overcast', 'rainy']
+    sunny, overcast, rainy = tree['children']
+    assert sunny == {'attribute': 2, 'split': 'numeric', 'threshold': 75.0,
+                     'children': [{'leaf': 'yes'}, {'leaf': 'no'}]}
+    assert overcast == {'leaf': 'yes'}
+    assert rainy['split'] == 'nominal' and rainy['values'] == ['TRUE', 'FALSE']
+
+
+def test_j48_binary_splits():
+    fixture = MODEL_FIXTURES['weather_j48_binary']
+    tree = parse_j48(fixture['description'], feature_attributes(fixture))
+    assert tree['split'] == 'equals' and tree['value'] == 'overcast'
+    assert tree['children'][0] == {'leaf': 'yes'}
+    windy = tree['children'][1]
+    assert windy['split'] == 'equals' and windy['value'] == 'TRUE'
+    # outlook is split on again below windy
+    assert windy['children'][1]['attribute'] == 0
+
+
+@pytest.mark.parametrize('name', ['weather_j48', 'weather_j48_binary', 'keyboard_j48'])
+def test_j48_leaf_count(name):
+    fixture = MODEL_FIXTURES[name]
+    description = fixture['description']
+    leaves = int(description.split('Number of Leaves')[1].split(':')[1].split()[0])
+    tree = parse_j48(description, feature_attributes(fixture))
+    assert count_leaves(tree) == leaves
+
+
+def test_naive_bayes_estimators():
+    fixture = MODEL_FIXTURES['weather_naive_bayes']
+    model = parse_naive_bayes(fixture['description'], feature_attributes(fixture), ['yes', 'no'])
+    # 9 yes and 5 no, Laplace-corrected
+    assert model['priors'] == pytest.approx([10 / 16, 6 / 16])
+    outlook, temperature, humidity, windy = model['estimators']
+    assert outlook['probabilities'][0] == pytest.approx([3 / 12, 5 / 12, 4 / 12])
+    assert temperature == {'kind': 'normal', 'mean': [72.9697, 74.8364],
+                           'std': [5.2304, 7.384], 'precision': [1.9091, 1.9091]}
+    assert windy['probabilities'][1] == pytest.approx([4 / 7, 3 / 7])
+
+
+def test_naive_bayes_touching_columns():
+    # Weka prints "34.9257-101.9837" for the delta_x means of classes 1 and 2
+    fixture = MODEL_FIXTURES['keyboard_naive_bayes']
+    assert '34.9257-101.9837' in fixture['description']
+    attributes = feature_attributes(fixture)
+    model = parse_naive_bayes(fixture['description'], attributes, ['0', '1', '2', '3'])
+    delta_x = model['estimators'][[a['name'] for a in attributes].index('delta_x')]
+    assert delta_x['mean'] == [-5.4855, 34.9257, -101.9837, 104.0226]
+
+
+@pytest.mark.parametrize('estimator', FIXTURES['normal_estimators'],
+                         ids=lambda e: f"precision={e['precision']}")
+def test_normal_bins_match_weka(estimator):
+    for x, probability in estimator['probabilities']:
+        assert _normal_bin(x, estimator['mean'], estimator['std'],
+                           estimator['precision']) == pytest.approx(probability, rel=1e-9, abs=1e-15)
+
+
+@pytest.mark.parametrize('name', ['weather_j48', 'weather_j48_binary', 'keyboard_j48',
+                                  'weather_naive_bayes'])
+def test_native_predictions_match_weka(name):
+    # Exact models: every prediction agrees
+    fixture = MODEL_FIXTURES[name]
+    agree, n = check(FakeWeka(fixture), 'model', native(fixture), fixture['arff'], 1.0)
+    assert agree == n == len(fixture['predictions'])
+
+
+def test_keyboard_naive_bayes_agreement():
+    # With the precision of food_y printed as 10.2222 instead of 92/9, the
+    # three instances with food_y = 230 fall in another bin: 6791/6794
+    fixture = MODEL_FIXTURES['keyboard_naive_bayes']
+    agree, n = check(FakeWeka(fixture), 'model', native(fixture), fixture['arff'])
+    assert n == 6794
+    assert agree >= MIN_AGREEMENT * n
+    with pytest.raises(ValueError, match='agree on only'):
+        check(FakeWeka(fixture), 'model', native(fixture), fixture['arff'], 1.0)
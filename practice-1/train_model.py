@@ -0,0 +1,360 @@
+"""
+Snake Eater model trainer
+Fits C4.5 decision trees and Naive Bayes on ARFF datasets with NumPy
+Machine Learning Classes - University Carlos III of Madrid
+
+Usage (from the practice-1 folder):
+    python train_model.py training_keyboard.arff --output j48.json
+    python train_model.py training_keyboard.arff --algorithm naive_bayes --output naivebayes.json
+
+The last attribute is the class and must be nominal. Accuracy is reported
+on the training file and on the matching test file (training_X.arff ->
+test_X.arff) when it exists. The model is written in the JSON format of
+native_model.py, so SnakeGame.py can play it through NATIVE_MODEL.
+
+The tree follows Weka's J48 defaults: gain ratio among attributes with at
+least average information gain, MDL-corrected numeric splits, at least 2
+instances in two branches, and pessimistic-error pruning with confidence
+0.25 (subtree replacement only, no subtree raising). Numeric splits are
+searched on presorted columns: one cumulative class-count pass per
+attribute scores every threshold at once.
+"""
+import argparse
+import json
+import math
+import os
+import time
+from statistics import NormalDist
+
+import numpy as np
+
+from arff_reader import load_arff
+from native_model import load_native, MODELS
+
+
+def _entropy(counts):
+    # Entropy in bits of each row of class counts
+    counts = np.asarray(counts, dtype=np.float64)
+    totals = counts.sum(axis=-1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p = np.where(counts > 0, counts / totals, 1.0)
+        return -(np.where(counts > 0, p * np.log2(p), 0.0)).sum(axis=-1)
+
+
+def _split_info(sizes):
+    sizes = np.asarray(sizes, dtype=np.float64)
+    return _entropy(sizes[np.newaxis])[0]
+
+
+class C45:
+    def __init__(self, min_leaf=2, confidence=0.25, prune=True):
+        self.min_leaf = min_leaf
+        self.confidence = confidence
+        self.prune = prune
+        self._z = NormalDist().inv_cdf(1 - confidence)
+
+    def fit(self, X, nominal, y, n_classes):
+        # X: list of feature columns; nominal: value count of each nominal
+        # column, None for numeric ones; y: class codes
+        self.X, self.nominal, self.y, self.n_classes = X, nominal, y, n_classes
+        self.onehot = np.eye(n_classes, dtype=np.int32)[y]
+        rows = np.arange(len(y))
+        # Row order of every numeric column, kept sorted down the tree
+        order = {j: np.argsort(X[j], kind='stable')
+                 for j in range(len(X)) if nominal[j] is None}
+        tree = self._grow(rows, order)
+        if self.prune:
+            tree = self._prune(tree, rows)
+        return tree
+
+    def _leaf(self, counts):
+        return {'leaf': int(np.argmax(counts))}
+
+    def _grow(self, rows, order):
+        counts = self.onehot[rows].sum(axis=0)
+        n = len(rows)
+        if counts.max() == n or n < 2 * self.min_leaf:
+            return self._leaf(counts)
+        # Weka: no branch may get fewer than this many instances
+        min_split = min(max(0.1 * n / self.n_classes, self.min_leaf), 25)
+        base = _entropy(counts)
+        candidates = []
+        for j in range(len(self.X)):
+            if self.nominal[j] is None:
+                split = self._numeric_split(j, order[j], base, n, min_split)
+            else:
+                split = self._nominal_split(j, rows, base, n)
+            if split is not None:
+                candidates.append(split)
+        if not candidates:
+            return self._leaf(counts)
+        # Best gain ratio among splits with at least average gain
+        average = sum(c[0] for c in candidates) / len(candidates)
+        best = max((c for c in candidates if c[0] >= average - 1e-3), key=lambda c: c[1])
+        gain, ratio, j, threshold = best
+        if gain <= 0:
+            return self._leaf(counts)
+
+        column = self.X[j]
+        if threshold is not None:
+            # NaN goes right, as in the native predictor
+            goes = np.where(column <= threshold, 0, 1)
+            n_branches = 2
+        else:
+            n_branches = self.nominal[j]
+            goes = np.where(column < 0, n_branches - 1, column)
+        in_node = np.zeros(len(self.y), dtype=bool)
+        in_node[rows] = True
+        children = []
+        for b in range(n_branches):
+            member = in_node & (goes == b)
+            child_rows = rows[member[rows]]
+            if len(child_rows) == 0:
+                children.append(self._leaf(counts))
+                continue
+            child_order = {k: o[member[o]] for k, o in order.items()}
+            children.append(self._grow(child_rows, child_order))
+        if threshold is not None:
+            return {'attribute': j, 'split': 'numeric', 'threshold': float(threshold),
+                    'children': children}
+        return {'attribute': j, 'split': 'nominal', 'children': children}
+
+    def _numeric_split(self, j, sorted_rows, base, n, min_split):
+        # Scores every threshold between distinct sorted values at once
+        values = self.X[j][sorted_rows]
+        known = ~np.isnan(values)
+        n_known = int(known.sum())
+        if n_known < 2 * min_split:
+            return None
+        values = values[:n_known]
+        left = np.cumsum(self.onehot[sorted_rows[:n_known]], axis=0)[:-1]
+        total = self.onehot[sorted_rows].sum(axis=0)
+        n_left = np.arange(1, n_known)
+        valid = (values[:-1] < values[1:]) & (n_left >= min_split) & (n_known - n_left >= min_split)
+        if not valid.any():
+            return None
+        left, n_left = left[valid], n_left[valid]
+        right = total - left
+        n_right = n - n_left
+        children = (n_left * _entropy(left) + n_right * _entropy(right)) / n
+        gains = base - children
+        i = int(np.argmax(gains))
+        # MDL correction for choosing among many thresholds
+        gain = gains[i] - math.log2(valid.sum()) / n
+        if gain <= 0:
+            return None
+        ratio = gain / _split_info([n_left[i], n_right[i]])
+        threshold = values[:-1][valid][i]
+        return gain, ratio, j, threshold
+
+    def _nominal_split(self, j, rows, base, n):
+        n_values = self.nominal[j]
+        codes = self.X[j][rows]
+        codes = np.where(codes < 0, n_values - 1, codes)
+        counts = np.zeros((n_values, self.n_classes))
+        np.add.at(counts, codes, self.onehot[rows])
+        sizes = counts.sum(axis=1)
+        if (sizes >= self.min_leaf).sum() < 2:
+            return None
+        gain = base - (sizes * _entropy(counts)).sum() / n
+        if gain <= 0:
+            return None
+        return gain, gain / _split_info(sizes[sizes > 0]), j, None
+
+    def _added_errors(self, n, e):
+        # Weka's Stats.addErrs: extra errors at the pruning confidence
+        if e < 1:
+            base = n * (1 - self.confidence ** (1 / n))
+            return base if e == 0 else base + e * (self._added_errors(n, 1) - base)
+        if e + 0.5 >= n:
+            return max(n - e, 0)
+        z = self._z
+        f = (e + 0.5) / n
+        r = ((f + z * z / (2 * n) + z * math.sqrt(f / n - f * f / n + z * z / (4 * n * n)))
+             / (1 + z * z / n))
+        return r * n - e
+
+    def _leaf_error(self, counts):
+        n = counts.sum()
+        e = n - counts.max()
+        return e + self._added_errors(n, e) if n else 0.0
+
+    def _prune(self, node, rows):
+        # Bottom-up subtree replacement; returns the pruned node
+        counts = self.onehot[rows].sum(axis=0)
+        if 'leaf' in node:
+            return node
+        column = self.X[node['attribute']][rows]
+        if node['split'] == 'numeric':
+            goes = np.where(column <= node['threshold'], 0, 1)
+        else:
+            goes = np.where(column < 0, len(node['children']) - 1, column)
+        subtree_error = 0.0
+        for b, child in enumerate(node['children']):
+            child_rows = rows[goes == b]
+            node['children'][b] = self._prune(child, child_rows)
+            subtree_error += self._error(node['children'][b], child_rows)
+        if self._leaf_error(counts) <= subtree_error + 0.1:
+            return self._leaf(counts)
+        return node
+
+    def _error(self, node, rows):
+        # Estimated errors of a (pruned) subtree on rows
+        counts = self.onehot[rows].sum(axis=0)
+        if 'leaf' in node:
+            n = counts.sum()
+            e = n - counts[node['leaf']]
+            return e + self._added_errors(n, e) if n else 0.0
+        column = self.X[node['attribute']][rows]
+        if node['split'] == 'numeric':
+            goes = np.where(column <= node['threshold'], 0, 1)
+        else:
+            goes = np.where(column < 0, len(node['children']) - 1, column)
+        return sum(self._error(child, rows[goes == b]) for b, child in enumerate(node['children']))
+
+
+def _labelled(tree, attributes, labels):
+    # Tree with class labels and nominal values, as native_model expects
+    if 'leaf' in tree:
+        return {'leaf': labels[tree['leaf']]}
+    children = [_labelled(c, attributes, labels) for c in tree['children']]
+    if tree['split'] == 'nominal':
+        return dict(tree, values=attributes[tree['attribute']]['values'], children=children)
+    return dict(tree, children=children)
+
+
+def fit_tree(dataset, min_leaf=2, confidence=0.25, prune=True):
+    # native_model JSON of a C4.5 tree fitted on dataset
+    X, nominal, y, attributes, labels = _split_class(dataset)
+    tree = C45(min_leaf, confidence, prune).fit(X, nominal, y, len(labels))
+    return {'type': 'j48', 'attributes': attributes, 'class': _class_json(dataset),
+            'tree': _labelled(tree, attributes, labels)}
+
+
+def fit_naive_bayes(dataset):
+    # native_model JSON of a Naive Bayes model with Weka's estimators
+    X, nominal, y, attributes, labels = _split_class(dataset)
+    n_classes = len(labels)
+    counts = np.bincount(y, minlength=n_classes)
+    priors = (counts + 1) / (counts.sum() + n_classes)
+    estimators = []
+    for column, n_values in zip(X, nominal):
+        if n_values is not None:
+            table = np.ones((n_classes, n_values))
+            known = column >= 0
+            np.add.at(table, (y[known], column[known]), 1)
+            estimators.append({'kind': 'discrete',
+                               'probabilities': (table / table.sum(axis=1, keepdims=True)).tolist()})
+            continue
+        # Precision: average gap between distinct values, as in Weka
+        distinct = np.unique(column[~np.isnan(column)])
+        precision = (distinct[-1] - distinct[0]) / (len(distinct) - 1) if len(distinct) > 1 else 0.01
+        rounded = np.round(column / precision) * precision
+        means, stds = [], []
+        for k in range(n_classes):
+            values = rounded[(y == k) & ~np.isnan(column)]
+            if len(values) == 0:
+                means.append(0.0)
+                stds.append(precision / 6)
+                continue
+            mean = values.mean()
+            std = values.std()
+            means.append(float(mean))
+            stds.append(float(max(precision / 6, std)) if std > 1e-10 else precision / 6)
+        estimators.append({'kind': 'normal', 'mean': means, 'std': stds,
+                           'precision': [float(precision)] * n_classes})
+    return {'type': 'naive_bayes', 'attributes': attributes, 'class': _class_json(dataset),
+            'priors': priors.tolist(), 'estimators': estimators}
+
+
+def _split_class(dataset):
+    if not dataset.is_nominal(len(dataset.attributes) - 1):
+        raise ValueError("the class (last attribute) must be nominal")
+    X = [np.asarray(c) for c in dataset.columns[:-1]]
+    nominal = [len(values) if values is not None else None
+               for _, values in dataset.attributes[:-1]]
+    y = np.asarray(dataset.columns[-1])
+    if (y < 0).any():
+        keep = y >= 0
+        X, y = [c[keep] for c in X], y[keep]
+    attributes = [{'name': name, 'values': values} for name, values in dataset.attributes[:-1]]
+    return X, nominal, y.astype(np.intp), attributes, dataset.attributes[-1][1]
+
+
+def _class_json(dataset):
+    name, values = dataset.attributes[-1]
+    return {'name': name, 'values': values}
+
+
+def rows_of(dataset):
+    # Instances as lists of values (nominal ones as labels), without the class
+    columns = []
+    for i in range(len(dataset.attributes) - 1):
+        columns.append(dataset.labels(i).tolist() if dataset.is_nominal(i)
+                       else np.asarray(dataset.columns[i]).tolist())
+    return [list(row) for row in zip(*columns)]
+
+
+def accuracy(native, dataset):
+    predicted = native.predict_many(rows_of(dataset))
+    actual = dataset.labels(len(dataset.attributes) - 1).tolist()
+    return sum(p == a for p, a in zip(predicted, actual)) / len(actual)
+
+
+def test_path(train_path):
+    # training_keyboard.arff -> test_keyboard.arff
+    directory, name = os.path.split(train_path)
+    return os.path.join(directory, name.replace('training', 'test', 1)) if 'training' in name else None
+
+
+def tree_size(node):
+    # (leaves, nodes), as in Weka's summary
+    if 'leaf' in node:
+        return 1, 1
+    sizes = [tree_size(c) for c in node['children']]
+    return sum(s[0] for s in sizes), 1 + sum(s[1] for s in sizes)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train a C4.5 tree or Naive Bayes on an ARFF file.")
+    parser.add_argument('train', help="training ARFF file (class = last attribute, nominal)")
+    parser.add_argument('--algorithm', choices=sorted(MODELS), default='j48',
+                        help="j48 (C4.5 tree, default) or naive_bayes")
+    parser.add_argument('--test', default=None,
+                        help="held-out ARFF file (default: the matching test_*.arff)")
+    parser.add_argument('--output', default=None, help="JSON model file to write")
+    parser.add_argument('--min-leaf', type=int, default=2,
+                        help="minimum instances per leaf (default: 2, like J48 -M)")
+    parser.add_argument('--confidence', type=float, default=0.25,
+                        help="pruning confidence (default: 0.25, like J48 -C)")
+    parser.add_argument('--unpruned', action='store_true', help="do not prune the tree")
+    args = parser.parse_args(argv)
+
+    train = load_arff(args.train)
+    start = time.perf_counter()
+    try:
+        if args.algorithm == 'j48':
+            model = fit_tree(train, args.min_leaf, args.confidence, not args.unpruned)
+        else:
+            model = fit_naive_bayes(train)
+    except ValueError as e:
+        raise SystemExit(f"{args.train}: {e}")
+    elapsed = time.perf_counter() - start
+    native = MODELS[model['type']](model)
+    print(f"{args.algorithm} trained on {len(train)} instances in {elapsed:.2f} s")
+    if model['type'] == 'j48':
+        leaves, size = tree_size(model['tree'])
+        print(f"  leaves: {leaves}, size of the tree: {size}")
+    print(f"  training accuracy: {accuracy(native, train):.2%}")
+    test = args.test or test_path(args.train)
+    if test and os.path.exists(test):
+        print(f"  test accuracy ({test}): {accuracy(native, load_arff(test)):.2%}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(model, f, indent=1)
+        load_native(args.output)
+        print(f"  model written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
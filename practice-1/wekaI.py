@@ -1,6 +1,8 @@
 from __future__ import print_function
 from builtins import range
 from builtins import object
+import os
+from collections import OrderedDict
 import weka.core.jvm as jvm
 import weka.core.serialization as serialization
 from weka.core.converters import Loader
@@ -14,6 +16,14 @@ from weka.classifiers import Classifier
 
 class Weka(object):
 
+	# @param cache_size: Numero maximo de modelos (y de ficheros arff) que se
+	# mantienen cargados en memoria entre predicciones
+	#
+	def __init__(self, cache_size=8):
+		self.cache_size = cache_size
+		self._models = OrderedDict()
+		self._datasets = OrderedDict()
+
 	# Arranca la maquina virtual de java
 	#
 	def start_jvm(self):
@@ -30,16 +40,10 @@ class Weka(object):
 	# @return pred: La clase que predice
 	#
 	def predict(self, modelName, x, arffName, debug=False):
-		# Carga el arrf para conocer la estructura de las instancias
-		loader = Loader(classname="weka.core.converters.ArffLoader")
-		data = loader.load_file(arffName)
-
-		# Se asume que la clase es el ultimo atributo
-		data.class_is_last()
-
-		# Carga del modelo generado en Weka
-		objects = serialization.read_all(modelName)
-		cls = Classifier(jobject=objects[0])
+		# Estructura de las instancias (arff) y modelo generado en Weka; solo
+		# se leen de disco la primera vez o si el fichero ha cambiado
+		data = self.load_header(arffName)
+		cls = self.load_model(modelName)
 		if(debug):
 			print("Loaded model...")
 			print(cls)
@@ -70,6 +74,121 @@ class Weka(object):
 
 		return pred
 
+	# Predice la clase de muchas instancias a la vez: se crea un unico
+	# objeto Instances con todas ellas y se clasifica de una pasada
+	# @param modelName: Nombre del fichero que contiene el modelo generado en weka
+	# @param rows: Lista de instancias (listas de valores sin la clase)
+	# @param arffName: El nombre del fichero arff que se ha utilizado para generar el modelo en Weka
+	# @return preds: Lista con la clase que predice para cada instancia
+	#
+	def predict_many(self, modelName, rows, arffName):
+		header = self.load_header(arffName)
+		cls = self.load_model(modelName)
+		num_attributes = header.num_attributes
+
+		# Posicion de cada valor nominal, calculada una vez por lote en lugar
+		# de una llamada a Java por atributo e instancia
+		codes = {}
+		for i in range(0, num_attributes - 1):
+			attribute = header.attribute(i)
+			if attribute.is_nominal:
+				codes[i] = dict((attribute.value(j), j) for j in range(attribute.num_values))
+
+		data = Instances.template_instances(header, len(rows))
+		for row in rows:
+			values = [codes[i].get(v, -1) if i in codes else v for i, v in enumerate(row)]
+			# Valor tonto para la clase de la instancia
+			values.append(0)
+			data.add_instance(Instance.create_instance(values))
+		data.class_is_last()
+		return self._classify_all(cls, data)
+
+	# Clasifica todas las instancias de un fichero arff (p.ej. test_keyboard.arff)
+	# @return preds, actual: Clases predichas y clases reales
+	#
+	def predict_arff(self, modelName, arffName):
+		data = self.load_arff(arffName)
+		cls = self.load_model(modelName)
+		class_index = data.class_index
+		actual = [data.get_instance(i).get_value(class_index) for i in range(data.num_instances)]
+		if data.class_attribute.is_nominal:
+			actual = [data.class_attribute.value(int(v)) for v in actual]
+		return self._classify_all(cls, data), actual
+
+	def _classify_all(self, cls, data):
+		if getattr(cls, "is_batchpredictor", False):
+			# Una sola llamada a Java para todo el lote
+			distributions = cls.distributions_for_instances(data)
+			if data.class_attribute.is_nominal:
+				preds = distributions.argmax(axis=1).tolist()
+			else:
+				preds = distributions[:, 0].tolist()
+		else:
+			preds = [cls.classify_instance(data.get_instance(i)) for i in range(data.num_instances)]
+		if data.class_attribute.is_nominal:
+			class_attribute = data.class_attribute
+			labels = [class_attribute.value(j) for j in range(class_attribute.num_values)]
+			preds = [labels[int(p)] for p in preds]
+		return preds
+
+	# Carga la estructura de las instancias de un arff (solo la cabecera,
+	# sin instancias), con la clase como ultimo atributo
+	# @param arffName: El nombre del fichero arff
+	# @return header: Instances vacio con los atributos del arff
+	#
+	def load_header(self, arffName):
+		return self._cached(self._datasets, arffName, self._read_header)
+
+	# Carga todas las instancias de un arff; no se guarda en la cache
+	# @param arffName: El nombre del fichero arff
+	# @return data: Las instancias, con la clase como ultimo atributo
+	#
+	def load_arff(self, arffName):
+		loader = Loader(classname="weka.core.converters.ArffLoader")
+		data = loader.load_file(arffName)
+		# Se asume que la clase es el ultimo atributo
+		data.class_is_last()
+		return data
+
+	# Carga un modelo generado en Weka
+	# @param modelName: Nombre del fichero que contiene el modelo
+	# @return cls: El clasificador
+	#
+	def load_model(self, modelName):
+		return self._cached(self._models, modelName, self._read_model)
+
+	# Vacia las caches de modelos y de ficheros arff
+	def clear_cache(self):
+		self._models.clear()
+		self._datasets.clear()
+
+	def _read_header(self, arffName):
+		# Solo se guarda la cabecera: las instancias del fichero no hacen
+		# falta para clasificar y ocuparian memoria en la cache
+		header = Instances.template_instances(self.load_arff(arffName), 0)
+		header.class_is_last()
+		return header
+
+	def _read_model(self, modelName):
+		objects = serialization.read_all(modelName)
+		return Classifier(jobject=objects[0])
+
+	# Cache LRU por ruta: devuelve el objeto guardado si la fecha de
+	# modificacion del fichero no ha cambiado, y si no lo vuelve a cargar
+	def _cached(self, cache, fileName, load):
+		key = os.path.abspath(fileName)
+		mtime = os.stat(key).st_mtime_ns
+		entry = cache.get(key)
+		if entry is not None and entry[0] == mtime:
+			cache.move_to_end(key)
+			return entry[1]
+		obj = load(fileName)
+		cache[key] = (mtime, obj)
+		cache.move_to_end(key)
+		while len(cache) > self.cache_size:
+			cache.popitem(last=False)
+		return obj
+
 ################################# DEBUG ##############################################
 #weka = Weka()
 #weka.start_jvm()
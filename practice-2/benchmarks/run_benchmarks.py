@@ -0,0 +1,338 @@
+"""
+Snake Eater benchmarks
+Throughput of the environment, the learner and whole training episodes
+Machine Learning Classes - University Carlos III of Madrid
+
+Usage (from the practice-2 folder):
+    python benchmarks/run_benchmarks.py                  # run and compare to the baseline
+    python benchmarks/run_benchmarks.py --save-baseline  # store this run as the baseline
+    python benchmarks/run_benchmarks.py --quick --filter env_step
+
+Results are written as JSON (--output). Every result is compared against
+the stored baseline and the script exits with status 1 when a result is
+worse than the baseline by more than --tolerance.
+"""
+import argparse
+import importlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+PRACTICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+# Module names shared by the phase folders; they are loaded one phase at a time
+PHASE_MODULES = ('snake_env', 'encoders', 'q_learning', 'q_table_io', 'sparse_table', 'rng', 'checkpoint')
+
+BOARDS = (15, 30, 60)
+LENGTHS = (3, 50, 200)
+
+
+def load_phase(folder):
+    # Imports the modules of one phase folder without letting them clash
+    # with the modules of the other phase
+    directory = os.path.join(PRACTICE_DIR, folder)
+    saved = {name: sys.modules.pop(name) for name in PHASE_MODULES if name in sys.modules}
+    sys.path.insert(0, directory)
+    try:
+        return {name: importlib.import_module(name) for name in PHASE_MODULES
+                if os.path.exists(os.path.join(directory, name + '.py'))}
+    finally:
+        sys.path.remove(directory)
+        for name in PHASE_MODULES:
+            sys.modules.pop(name, None)
+        sys.modules.update(saved)
+
+
+def measure(run, min_time, repeats=3):
+    # run(n) performs n operations and returns the seconds spent on them.
+    # Returns the best operations/second over several repeats.
+    n = 1
+    while True:
+        elapsed = run(n)
+        if elapsed >= min_time / 10:
+            break
+        n *= 4
+    n = max(1, int(n * min_time / max(elapsed, 1e-9)))
+    return max(n / run(n) for _ in range(repeats))
+
+
+def place_snake(env, length):
+    # Lays a snake of the given length along a serpentine path from the top
+    # left corner, head last, with the food in the far corner
+    cells_x = env.frame_size_x // 10
+    cells_y = env.frame_size_y // 10
+    path = []
+    for y in range(cells_y):
+        xs = range(cells_x) if y % 2 == 0 else range(cells_x - 1, -1, -1)
+        path.extend((x, y) for x in xs)
+    body = [[x * 10, y * 10] for x, y in reversed(path[:length])]
+    env.snake_body = type(env.snake_body)(body)
+    env.snake_pos = list(body[0])
+    dx, dy = body[0][0] - body[1][0], body[0][1] - body[1][1]
+    env.direction = {(10, 0): 'RIGHT', (-10, 0): 'LEFT', (0, 10): 'DOWN', (0, -10): 'UP'}[(dx, dy)]
+    if hasattr(env, 'occupancy'):
+        env.occupancy = bytearray(len(env.occupancy))
+        for x, y in body:
+            env.occupancy[env._cell(x, y)] += 1
+    env.food_pos = [(cells_x - 1) * 10, (cells_y - 1) * 10]
+    env._prev_dist = abs(env.snake_pos[0] - env.food_pos[0]) + abs(env.snake_pos[1] - env.food_pos[1])
+    env.food_spawn = True
+    env.game_over = False
+
+
+def make_env(phase, board, growing_body=False, seed=0):
+    SnakeGameEnv = phase['snake_env'].SnakeGameEnv
+    if 'rng' in phase:
+        return SnakeGameEnv(board * 10, board * 10, growing_body, rng=phase['rng'].RandomStream(seed))
+    return SnakeGameEnv(board * 10, board * 10, growing_body)
+
+
+def bench_env_step(phase, board, length, min_time):
+    env = make_env(phase, board)
+    actions = np.random.default_rng(0).integers(0, 4, size=4096).tolist()
+
+    def run(n):
+        # Steps with random actions; putting the snake back after a crash
+        # is not timed
+        elapsed = 0.0
+        done = 0
+        place_snake(env, length)
+        while done < n:
+            start = time.perf_counter()
+            game_over = False
+            while done < n and not game_over:
+                game_over = env.step(actions[done & 4095])[2]
+                done += 1
+            elapsed += time.perf_counter() - start
+            if game_over:
+                place_snake(env, length)
+        return elapsed
+    return measure(run, min_time)
+
+
+def bench_get_state(phase, board, length, min_time):
+    env = make_env(phase, board)
+    place_snake(env, length)
+
+    def run(n):
+        get_state = env.get_state
+        start = time.perf_counter()
+        for _ in range(n):
+            get_state()
+        return time.perf_counter() - start
+    return measure(run, min_time)
+
+
+def make_learner(phase, n_states, seed=0):
+    QLearning = phase['q_learning'].QLearning
+    table = np.zeros((n_states, 4))
+    if 'rng' in phase:
+        ql = QLearning(n_states, 4, alpha=0.1, epsilon=0.1, q_table=table,
+                       rng=phase['rng'].RandomStream(seed))
+    else:
+        # Older learners always read their table from disk first
+        ql = QLearning(n_states, 4, alpha=0.1, epsilon=0.1)
+        ql.q_table = table
+    ql.epsilon_min = 0.1
+    return ql
+
+
+def bench_update(phase, n_states, min_time):
+    ql = make_learner(phase, n_states)
+    rng = np.random.default_rng(0)
+    states = rng.integers(0, n_states, size=4096).tolist()
+    actions = rng.integers(0, 4, size=4096).tolist()
+    rewards = rng.choice([-1.0, 0.0, 1.0, 10.0, -30.0], size=4096).tolist()
+
+    def run(n):
+        update = ql.update_q_table
+        start = time.perf_counter()
+        for i in range(n):
+            j = i & 4095
+            update(states[j], actions[j], rewards[j], states[(j + 1) & 4095])
+        return time.perf_counter() - start
+    return measure(run, min_time)
+
+
+def bench_choose_action(phase, n_states, min_time):
+    ql = make_learner(phase, n_states)
+    states = np.random.default_rng(0).integers(0, n_states, size=4096).tolist()
+    allowed_actions = [0, 1, 2, 3]
+
+    def run(n):
+        choose = ql.choose_action
+        start = time.perf_counter()
+        for i in range(n):
+            choose(states[i & 4095], allowed_actions)
+        return time.perf_counter() - start
+    return measure(run, min_time)
+
+
+def bench_episodes(phase, n_states, board, growing_body, min_time, max_steps=2000):
+    # Training episodes (choose, step, update) without saving the table
+    env = make_env(phase, board, growing_body)
+    ql = make_learner(phase, n_states)
+    allowed_actions = [0, 1, 2, 3]
+
+    def run(n):
+        start = time.perf_counter()
+        for _ in range(n):
+            state = env.reset()
+            for _ in range(max_steps):
+                action = ql.choose_action(state, allowed_actions)
+                next_state, reward, game_over = env.step(action)
+                ql.update_q_table(state, action, reward, next_state)
+                state = next_state
+                if game_over:
+                    break
+        return time.perf_counter() - start
+    return measure(run, min_time)
+
+
+def bench_table_io(phase_three, min_time):
+    # Latency (seconds per call) of saving and loading a phase three table,
+    # next to the np.savetxt/np.loadtxt text format it replaced
+    save_table = phase_three['q_table_io'].save_table
+    read_table = phase_three['q_table_io'].read_table
+    table = np.random.default_rng(0).standard_normal((4096, 4))
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        binary = os.path.join(tmp, 'q_table.bin')
+        text = os.path.join(tmp, 'q_table.txt')
+        save_table(binary, table, 1)
+        np.savetxt(text, table)
+
+        def timed(fn):
+            def run(n):
+                start = time.perf_counter()
+                for _ in range(n):
+                    fn()
+                return time.perf_counter() - start
+            return 1.0 / measure(run, min_time)
+
+        results['table_save_binary'] = timed(lambda: save_table(binary, table, 1))
+        results['table_load_binary'] = timed(lambda: np.asarray(read_table(binary, 4096, 4, 1)).sum())
+        results['table_save_text'] = timed(lambda: np.savetxt(text, table))
+        results['table_load_text'] = timed(lambda: np.loadtxt(text))
+    return results
+
+
+def run_benchmarks(min_time, name_filter=None):
+    phases = {'phase_two': (load_phase('phase two'), 2048),
+              'phase_three': (load_phase('phase three'), 4096)}
+    results = {}
+
+    def record(name, unit, fn, *args):
+        if name_filter and name_filter not in name:
+            return
+        value = fn(*args)
+        results[name] = {'value': value, 'unit': unit}
+        print(f"{name:<48} {value:>14,.1f} {unit}" if unit.endswith('/s')
+              else f"{name:<48} {value * 1e3:>14,.3f} ms")
+
+    for phase_name, (phase, n_states) in phases.items():
+        for board in BOARDS:
+            for length in LENGTHS:
+                if length > board * board * 0.9:
+                    continue
+                record(f"env_step.{phase_name}.{board}x{board}.len{length}", 'steps/s',
+                       bench_env_step, phase, board, length, min_time)
+                record(f"get_state.{phase_name}.{board}x{board}.len{length}", 'calls/s',
+                       bench_get_state, phase, board, length, min_time)
+        record(f"update_q_table.{phase_name}", 'updates/s', bench_update, phase, n_states, min_time)
+        record(f"choose_action.{phase_name}", 'calls/s', bench_choose_action, phase, n_states, min_time)
+        for growing_body in (False, True):
+            growth = 'growing' if growing_body else 'fixed'
+            record(f"episodes.{phase_name}.30x30.{growth}", 'episodes/s',
+                   bench_episodes, phase, n_states, 30, growing_body, min_time)
+
+    if not name_filter or 'table_' in name_filter:
+        for name, seconds in bench_table_io(phases['phase_three'][0], min_time).items():
+            if name_filter and name_filter not in name:
+                continue
+            results[name] = {'value': seconds, 'unit': 's'}
+            print(f"{name:<48} {seconds * 1e3:>14,.3f} ms")
+    return results
+
+
+def compare(results, baseline, tolerance):
+    # Returns the names of results worse than the baseline by more than
+    # tolerance (a fraction). Rates should go up, latencies (unit "s") down.
+    regressions = []
+    print(f"\n{'benchmark':<48} {'baseline':>14} {'current':>14} {'change':>8}")
+    for name, result in sorted(results.items()):
+        if name not in baseline:
+            continue
+        old = baseline[name]['value']
+        new = result['value']
+        if result['unit'] == 's':
+            change = old / new - 1.0
+        else:
+            change = new / old - 1.0
+        flag = ''
+        if change < -tolerance:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f"{name:<48} {old:>14.6g} {new:>14.6g} {change:>+7.1%}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the snake environment and learner.")
+    parser.add_argument('--output', default='benchmark_results.json',
+                        help="where to write this run's results (default: benchmark_results.json)")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE,
+                        help="baseline results to compare against")
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="store this run as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help="allowed slowdown before a result counts as a regression (default: 0.10)")
+    parser.add_argument('--min-time', type=float, default=0.5,
+                        help="seconds spent on each measurement (default: 0.5)")
+    parser.add_argument('--quick', action='store_true', help="shorter measurements (0.1 s)")
+    parser.add_argument('--filter', default=None, help="only run benchmarks whose name contains this")
+    args = parser.parse_args(argv)
+
+    args.output = os.path.abspath(args.output)
+    args.baseline = os.path.abspath(args.baseline)
+    # The learners and environments use paths relative to practice-2
+    os.chdir(PRACTICE_DIR)
+    min_time = 0.1 if args.quick else args.min_time
+    results = run_benchmarks(min_time, args.filter)
+    report = {
+        'meta': {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'min_time': min_time,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)['results']
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) slower than the baseline")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,82 +5,172 @@ Last modification in April 2024 by José Luis Perán
 Machine Learning Classes - University Carlos III of Madrid
 """
 from snake_env import SnakeGameEnv
+from encoders import DEFAULT_ENCODER
 from q_learning import QLearning
-import pygame
-import sys
+from checkpoint import CheckpointWriter
+from instrument import Instrumentation
+from rng import RandomStream
 
 def main():
     # Window size
     FRAME_SIZE_X = 300
     FRAME_SIZE_Y = 300
 
-    # Colors (R, G, B)
-    BLACK = pygame.Color(0, 0, 0)
-    WHITE = pygame.Color(255, 255, 255)
-    RED = pygame.Color(255, 0, 0)
-    GREEN = pygame.Color(0, 255, 0)
-    BLUE = pygame.Color(0, 0, 255)
-
     difficulty = 75 # Adjust as needed
     render_game = True # Show the game or not
     growing_body = False # Makes the body of the snake grow
     training = False # Defines if it should train or not
 
-    # Initialize the game window, environment and q_learning algorithm
-    # Your code here.
-    # You must define the number of possible states.
-    number_states = 4096
-    pygame.init()
-    env = SnakeGameEnv(FRAME_SIZE_X, FRAME_SIZE_Y, growing_body)
-    ql = QLearning(n_states=number_states, n_actions=4)
+    # State encoding (see encoders.py); the number of states follows from it
+    encoder = DEFAULT_ENCODER
     num_episodes = 5000
 
+    run(training=training, render_game=render_game, num_episodes=num_episodes,
+        frame_size_x=FRAME_SIZE_X, frame_size_y=FRAME_SIZE_Y,
+        growing_body=growing_body, difficulty=difficulty,
+        encoder=encoder)
+
+
+def run(training=False, render_game=True, num_episodes=5000,
+        frame_size_x=300, frame_size_y=300, growing_body=False, difficulty=75,
+        encoder=DEFAULT_ENCODER, q_table_file="phase three/q_table.bin",
+        log_every=1, checkpoint_every=1, checkpoint_seconds=None,
+        keep_checkpoints=0, seed=None, profile=False, profile_every=0,
+        profile_out=None, render_every_episodes=1, render_every_frames=1,
+        dirty_rects=True, record_file=None, record_states=False,
+        record_rewards=False, policy_file=None, converge_td=None, converge_window=100,
+        converge_patience=None, converge_min_delta=0.0, eval_every=100, eval_episodes=20,
+        min_episodes=0, **ql_params):
+    # Runs the training/playing loop. pygame is only imported when the
+    # game is rendered, so headless runs never load it.
+    if render_game:
+        from renderer import Renderer
+
+        renderer = Renderer(frame_size_x, frame_size_y, difficulty, render_every_episodes,
+                            render_every_frames, dirty_rects)
+
+    # Initialize the environment and q_learning algorithm, each with its
+    # own random stream derived from the seed
+    env_rng, ql_rng = RandomStream(seed).spawn(2)
+    if policy_file:
+        # Play a compiled greedy policy: one table lookup per step
+        from policy import load_greedy_policy
+
+        if training:
+            raise ValueError("a compiled policy can only be played, not trained")
+        policy = load_greedy_policy(policy_file)
+        encoder = policy.encoder
+    env = SnakeGameEnv(frame_size_x, frame_size_y, growing_body, rng=env_rng, encoder=encoder)
+    if not policy_file:
+        ql = QLearning(n_states=env.n_states, n_actions=4, filename=q_table_file,
+                       rng=ql_rng, encoder_id=env.encoder.id, convert_text=training,
+                       **ql_params)
+    if training:
+        # The table is saved from a background thread on the given cadence
+        checkpoints = CheckpointWriter(ql, checkpoint_every, checkpoint_seconds, keep_checkpoints)
+        checkpoints.install_signal_handler()
+
+    # Opt-in timers; when disabled no method is replaced.
+    # step() calls _encode, _reward and check_game_over internally, so
+    # those phases are also counted inside env.step.
+    instruments = Instrumentation(profile, profile_every)
+    instruments.wrap(env, 'step', 'env.step')
+    instruments.wrap(env, 'reset', 'env.reset')
+    instruments.wrap(env, '_encode', 'env.get_state')
+    instruments.wrap(env, '_reward', 'env.calculate_reward')
+    instruments.wrap(env, 'check_game_over', 'env.check_game_over')
+    if policy_file:
+        instruments.wrap(policy, 'action', 'policy.action')
+    else:
+        instruments.wrap(ql, 'choose_action', 'ql.choose_action')
+        instruments.wrap(ql, 'update_q_table', 'ql.update_q_table')
+    if training:
+        instruments.wrap(checkpoints, 'episode_done', 'checkpoint')
 
     if render_game:
-        game_window = pygame.display.set_mode((FRAME_SIZE_X, FRAME_SIZE_Y))
-        fps_controller = pygame.time.Clock()
+        instruments.wrap(renderer, 'frame', 'render')
+    if record_file:
+        # Appends every episode to a log that episode_log.py can replay
+        from episode_log import EpisodeRecorder
+
+        recorder = EpisodeRecorder(record_file, record_states, record_rewards)
+    monitor = None
+    if training and (converge_td is not None or converge_patience is not None):
+        # Stops training once the TD errors and/or greedy score settle
+        import numpy as np
+        from convergence import ConvergenceMonitor
+
+        monitor = ConvergenceMonitor(env.encoder, frame_size_x, frame_size_y, growing_body,
+                                     converge_td, converge_window, converge_patience,
+                                     converge_min_delta, eval_every, eval_episodes,
+                                     min_episodes, np.random.SeedSequence(seed).spawn(3)[2])
 
     for episode in range(num_episodes):
+        if record_file:
+            recorder.begin_episode(episode + 1, env)
         state = env.reset()
+        if render_game:
+            renderer.begin_episode(episode)
         total_reward = 0
+        td_sum = td_max = 0.0
+        steps = 0
         game_over = False
 
         while not game_over:
-            # Your code here.
-            # Choose the best action for the state and possible actions from the q_learning algorithm
-            allowed_actions = [0, 1, 2, 3]
-            action = ql.choose_action(state, allowed_actions)
+            if policy_file:
+                action = policy.action(state)
+            else:
+                # Choose the best action for the state and possible actions from the q_learning algorithm
+                allowed_actions = [0, 1, 2, 3]
+                action = ql.choose_action(state, allowed_actions)
             # Call the environment step with that action and get next_state, reward and game_over variables
             next_state, reward, game_over = env.step(action)
+            if record_file:
+                recorder.step(action, state, reward)
             if training:
                 #update the q table using those variables.
-                ql.update_q_table(state, action, reward, next_state)
+                td = ql.update_q_table(state, action, reward, next_state)
+                if monitor:
+                    td = abs(td)
+                    td_sum += td
+                    if td > td_max:
+                        td_max = td
+                    steps += 1
             # Update the state and the total_reward.
             state = next_state
             total_reward += reward
 
-            # Render
-            if render_game:
-                game_window.fill(BLACK)
-                snake_body = env.get_body()
-                food_pos = env.get_food()
-                for pos in snake_body:
-                    pygame.draw.rect(game_window, GREEN, pygame.Rect(pos[0], pos[1], 10, 10))
-                pygame.draw.rect(game_window, RED, pygame.Rect(food_pos[0], food_pos[1], 10, 10))
-
-            if env.check_game_over():
+            if game_over:
                 break
 
+            # Render
             if render_game:
-                for event in pygame.event.get():
-                    if event.type == pygame.QUIT:
-                        pygame.quit()
-                        sys.exit()
-                pygame.display.flip()
-                fps_controller.tick(difficulty)
-
-        ql.save_q_table()
-        print(f"Episode {episode+1}, Total reward: {total_reward}")
+                renderer.frame(env.get_body(), env.get_food())
+
+        if record_file:
+            recorder.end_episode(env.score, total_reward)
+        if training:
+            checkpoints.episode_done(episode + 1)
+        instruments.episode_done(episode + 1)
+        if (episode + 1) % log_every == 0:
+            if monitor:
+                print(f"Episode {episode+1}, Total reward: {total_reward}, "
+                      f"max |TD|: {td_max:.4g}, mean |TD|: {td_sum / max(steps, 1):.4g}")
+            else:
+                print(f"Episode {episode+1}, Total reward: {total_reward}")
+        if monitor and monitor.episode_done(episode + 1, td_sum, td_max, steps, ql.q_table):
+            break
+
+    if monitor:
+        print(monitor.summary(episode + 1))
+    if training:
+        checkpoints.close()
+    if record_file:
+        recorder.close()
+    if profile:
+        print(instruments.summary("at end of run"))
+        if profile_out:
+            instruments.dump(profile_out)
 
 if __name__ == "__main__":
     main()
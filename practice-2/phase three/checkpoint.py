@@ -0,0 +1,145 @@
+"""
+Snake Eater Q-table checkpoint writer
+Saves the Q-table from a background thread so training never waits on disk
+Machine Learning Classes - University Carlos III of Madrid
+"""
+import atexit
+import glob
+import os
+import shutil
+import signal
+import threading
+import time
+
+from q_table_io import save_table
+
+
+class CheckpointWriter:
+    def __init__(self, ql, every_episodes=1, every_seconds=None, keep=0, filename=None):
+        # ql: the QLearning instance whose table is saved
+        # every_episodes / every_seconds: save when either interval has passed
+        # (None disables that interval)
+        # keep: number of older checkpoints kept next to the main file
+        self.ql = ql
+        self.filename = filename or ql.filename
+        self.every_episodes = every_episodes
+        self.every_seconds = every_seconds
+        self.keep = keep
+
+        self._episode = 0  # latest episode reported by episode_done
+        self._last_episode = 0  # episode of the last snapshot
+        self._last_time = time.monotonic()
+        self._pending = None
+        self._writing = False
+        self._error = None
+        self._closed = False
+        self._previous_handler = None
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name='checkpoint-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def episode_done(self, episode):
+        # Called after every episode; snapshots the table when it is due
+        self._raise_error()
+        self._episode = episode
+        due = (self.every_episodes is not None
+               and episode - self._last_episode >= self.every_episodes)
+        if not due and self.every_seconds is not None:
+            due = time.monotonic() - self._last_time >= self.every_seconds
+        if due:
+            self.snapshot(episode)
+
+    def snapshot(self, episode=None):
+        # Copies the table and hands it to the writer thread. Only the newest
+        # snapshot is kept if the writer is still busy with an older one.
+        # Without an episode (final flush) it is tagged with the latest
+        # finished episode, so it never overwrites an older history file.
+        if episode is None:
+            episode = self._episode
+        table = self.ql.q_table.copy()
+        with self._cond:
+            self._pending = (episode, table)
+            self._cond.notify_all()
+        self._last_episode = episode
+        self._last_time = time.monotonic()
+
+    def flush(self):
+        # Saves the current table and waits until it is on disk. Once the
+        # writer is closed the table has already been saved, and there is
+        # no thread left to wait for.
+        if self._closed:
+            return
+        self.snapshot()
+        with self._cond:
+            while self._pending is not None or self._writing:
+                self._cond.wait()
+        self._raise_error()
+
+    def close(self):
+        if self._closed:
+            return
+        self._restore_signal_handler()
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        atexit.unregister(self.close)
+
+    def install_signal_handler(self):
+        # Flushes the table on Ctrl+C before the KeyboardInterrupt propagates.
+        # close() puts the previous handler back.
+        self._previous_handler = signal.getsignal(signal.SIGINT)
+
+        def handler(signum, frame):
+            self._restore_signal_handler()
+            self.flush()
+            raise KeyboardInterrupt
+
+        signal.signal(signal.SIGINT, handler)
+
+    def _restore_signal_handler(self):
+        # Signal handlers can only be changed from the main thread
+        if (self._previous_handler is not None
+                and threading.current_thread() is threading.main_thread()):
+            signal.signal(signal.SIGINT, self._previous_handler)
+            self._previous_handler = None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._closed:
+                    self._cond.wait()
+                if self._pending is None:
+                    return
+                episode, table = self._pending
+                self._pending = None
+                self._writing = True
+            try:
+                self._write(episode, table)
+            except Exception as e:
+                self._error = e
+            finally:
+                with self._cond:
+                    self._writing = False
+                    self._cond.notify_all()
+
+    def _write(self, episode, table):
+        save_table(self.filename, table, self.ql.encoder_id)
+        if self.keep:
+            root, ext = os.path.splitext(self.filename)
+            history = f"{root}.ep{episode:09d}{ext}"
+            if os.path.exists(history):
+                os.remove(history)
+            try:
+                os.link(self.filename, history)
+            except OSError:
+                shutil.copyfile(self.filename, history)
+            for old in sorted(glob.glob(glob.escape(root) + '.ep*' + ext))[:-self.keep]:
+                os.remove(old)
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
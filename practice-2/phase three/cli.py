@@ -0,0 +1,20 @@
+"""
+Snake Eater command line helpers
+Argument types shared by train.py, evaluate.py and sweep.py
+Machine Learning Classes - University Carlos III of Madrid
+
+Kept apart from train.py so the evaluation tools (and their worker
+processes) can parse a board size without importing the training code.
+"""
+import argparse
+
+
+def parse_board(value):
+    # "30x30" -> (300, 300) pixels; the board is given in cells of 10 px
+    try:
+        cells_x, cells_y = (int(v) for v in value.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"board must look like 30x30, got {value!r}")
+    if cells_x < 8 or cells_y < 8:
+        raise argparse.ArgumentTypeError("board must be at least 8x8 cells")
+    return cells_x * 10, cells_y * 10
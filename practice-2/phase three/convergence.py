@@ -0,0 +1,113 @@
+"""
+Snake Eater convergence detection
+Decides when a training run has stopped improving
+Machine Learning Classes - University Carlos III of Madrid
+
+Two signals are tracked while training:
+    - the absolute TD error of every update, summarized per episode as its
+      mean and max (how much the Q-table is still changing);
+    - a greedy evaluation score: every eval_every episodes the current
+      table plays the same eval_episodes seeded games without exploring.
+Training stops when every enabled criterion holds:
+    - td_tolerance: the mean |TD| of the last `window` episodes is below it;
+    - patience: the greedy score has not improved by more than min_delta
+      for that many evaluations in a row.
+"""
+from collections import deque
+
+import numpy as np
+
+from evaluate import greedy_actions, play_episode
+from sparse_table import SparseQTable
+
+
+class ConvergenceMonitor:
+    def __init__(self, encoder, frame_size_x, frame_size_y, growing_body, td_tolerance=None,
+                 window=100, patience=None, min_delta=0.0, eval_every=100, eval_episodes=20,
+                 min_episodes=0, seed_seq=None, max_steps=2000):
+        # encoder / frame sizes / growing_body: the game the greedy
+        # evaluations are played on (the same as the training game)
+        # min_episodes: never stop before this many episodes
+        # seed_seq: SeedSequence the evaluation games are derived from
+        if td_tolerance is None and patience is None:
+            raise ValueError("set td_tolerance, patience or both")
+        if patience is not None and not eval_every:
+            raise ValueError("patience needs greedy evaluations (eval_every > 0)")
+        self.encoder = encoder
+        self.frame_size_x = frame_size_x
+        self.frame_size_y = frame_size_y
+        self.growing_body = growing_body
+        self.td_tolerance = td_tolerance
+        self.patience = patience
+        self.min_delta = min_delta
+        self.eval_every = eval_every
+        self.eval_episodes = eval_episodes
+        self.min_episodes = min_episodes
+        self.max_steps = max_steps
+        seed_seq = seed_seq if seed_seq is not None else np.random.SeedSequence()
+        # The same games for every evaluation, so scores are comparable
+        self._eval_seeds = [np.random.SeedSequence(seed_seq.entropy,
+                                                   spawn_key=seed_seq.spawn_key + (i,))
+                            for i in range(eval_episodes)]
+
+        self.td_mean = deque(maxlen=window)
+        self.last_td_max = 0.0
+        self.evaluations = []  # (episode, mean greedy score)
+        self.best_score = None
+        self._since_best = 0
+        self.reason = None
+
+    def rolling_td(self):
+        return sum(self.td_mean) / len(self.td_mean) if self.td_mean else float('inf')
+
+    def evaluate(self, q_table):
+        # Mean score of the greedy policy of q_table over the evaluation games
+        if isinstance(q_table, SparseQTable):
+            q_table = q_table.to_dense()
+        greedy = greedy_actions(q_table)
+        scores = [play_episode(greedy, self.encoder, s, self.frame_size_x, self.frame_size_y,
+                               self.growing_body, self.max_steps)[0]
+                  for s in self._eval_seeds]
+        return sum(scores) / len(scores)
+
+    def episode_done(self, episode, td_sum, td_max, steps, q_table):
+        # td_sum / td_max: sum and max of |TD| over the episode's `steps`
+        # updates. Returns True once training should stop (see self.reason).
+        self.td_mean.append(td_sum / steps if steps else 0.0)
+        self.last_td_max = td_max
+        if self.eval_every and episode % self.eval_every == 0:
+            score = self.evaluate(q_table)
+            self.evaluations.append((episode, score))
+            if self.best_score is None or score > self.best_score + self.min_delta:
+                self.best_score = score
+                self._since_best = 0
+            else:
+                self._since_best += 1
+        if episode < self.min_episodes:
+            return False
+
+        reasons = []
+        if self.td_tolerance is not None:
+            if len(self.td_mean) < self.td_mean.maxlen or self.rolling_td() >= self.td_tolerance:
+                return False
+            reasons.append(f"mean |TD| over the last {len(self.td_mean)} episodes is "
+                           f"{self.rolling_td():.3g} < {self.td_tolerance:g}")
+        if self.patience is not None:
+            if self._since_best < self.patience:
+                return False
+            reasons.append(f"greedy score has not improved by more than {self.min_delta:g} "
+                           f"in {self._since_best} evaluations (best {self.best_score:.1f})")
+        self.reason = "; ".join(reasons)
+        return True
+
+    def summary(self, episodes):
+        if self.reason:
+            text = f"Converged after {episodes} episodes: {self.reason}"
+        else:
+            text = f"Ran all {episodes} episodes without converging"
+        text += f"\n  mean |TD| (last {len(self.td_mean)} episodes): {self.rolling_td():.4g}"
+        if self.evaluations:
+            episode, score = self.evaluations[-1]
+            text += (f"\n  greedy score: {score:.1f} at episode {episode}, "
+                     f"best {self.best_score:.1f}")
+        return text
@@ -0,0 +1,181 @@
+"""
+Snake Eater state encoders
+Registry of state features and of the encodings built from them
+Machine Learning Classes - University Carlos III of Madrid
+
+A feature declares its bit width and a Python expression for its value.
+An encoding is an ordered list of features, the first one in the most
+significant bits. For every encoding the packing code
+    (feature_1) << shift_1 | (feature_2) << shift_2 | ...
+is generated once, so encoding a state costs the same as a hand-written
+expression, and the number of states (2 ** total bits) is known up front.
+
+Feature expressions can use these names, computed once per state:
+    cell_s, cell_r, cell_l   board cells straight ahead, to the right and to
+                             the left of the head (-1 outside the board)
+    occupancy                body segments per board cell
+    head_x, head_y, fx, fy   head and food positions in pixels
+    direction                heading ('UP', 'DOWN', 'LEFT' or 'RIGHT')
+    cell_dist                Manhattan distance to the food in cells
+    length                   number of body segments
+
+Every feature also has a NumPy expression, used by VecSnakeEnv to encode
+a whole batch of games at once. It can use these arrays, one entry per
+game:
+    outside_s, outside_r, outside_l     the neighbour cell is off the board
+    occupied_s, occupied_r, occupied_l  a body segment is on that cell
+    head_x, head_y, fx, fy              head and food positions in cells
+    dir_code                            DIR_CODE of the heading
+    cell_dist, length                   as above
+"""
+import zlib
+
+import numpy as np
+
+DIR_CODE = {'UP': 0, 'RIGHT': 1, 'DOWN': 2, 'LEFT': 3}
+
+
+class Feature:
+    def __init__(self, bits, expression, array_expression):
+        self.bits = bits
+        self.expression = expression
+        self.array_expression = array_expression
+
+
+FEATURES = {
+    'danger_straight': Feature(1, "cell_s < 0 or occupancy[cell_s] > 0",
+                               "outside_s | occupied_s"),
+    'danger_right': Feature(1, "cell_r < 0 or occupancy[cell_r] > 0",
+                            "outside_r | occupied_r"),
+    'danger_left': Feature(1, "cell_l < 0 or occupancy[cell_l] > 0",
+                           "outside_l | occupied_l"),
+    # the head is never next to itself, so any segment there is body
+    'body_collision': Feature(1, "cell_s >= 0 and occupancy[cell_s] > 0", "occupied_s"),
+    'food_left': Feature(1, "fx < head_x", "fx < head_x"),
+    'food_right': Feature(1, "fx > head_x", "fx > head_x"),
+    'food_up': Feature(1, "fy < head_y", "fy < head_y"),
+    'food_down': Feature(1, "fy > head_y", "fy > head_y"),
+    'direction': Feature(2, "DIR_CODE[direction]", "dir_code"),
+    # distance to the food in 4 roughly even ranges
+    'distance_bucket': Feature(2, "0 if cell_dist <= 3 else 1 if cell_dist <= 8 "
+                                  "else 2 if cell_dist <= 15 else 3",
+                               "(cell_dist > 3) * 1 + (cell_dist > 8) + (cell_dist > 15)"),
+    'food_adjacent': Feature(1, "cell_dist == 1", "cell_dist == 1"),
+    'length_bucket': Feature(2, "0 if length <= 3 else 1 if length <= 10 "
+                                "else 2 if length <= 30 else 3",
+                             "(length > 3) * 1 + (length > 10) + (length > 30)"),
+}
+ARRAY_NAMES = ('outside_s', 'outside_r', 'outside_l', 'occupied_s', 'occupied_r', 'occupied_l',
+               'head_x', 'head_y', 'fx', 'fy', 'dir_code', 'cell_dist', 'length')
+
+
+class StateEncoder:
+    def __init__(self, name, features, encoder_id=None):
+        # encoder_id: number saved with Q-tables trained on this encoding;
+        # by default a checksum of the feature layout
+        self.name = name
+        self.features = tuple(features)
+        widths = [FEATURES[f].bits for f in self.features]
+        self.bits = sum(widths)
+        self.n_states = 1 << self.bits
+        # shift of every feature, the first one in the highest bits
+        self.shifts = {}
+        shift = self.bits
+        for feature, bits in zip(self.features, widths):
+            shift -= bits
+            self.shifts[feature] = shift
+        layout = ','.join(f"{f}:{FEATURES[f].bits}" for f in self.features)
+        self.id = encoder_id if encoder_id is not None else zlib.crc32(layout.encode('ascii'))
+        self.encode = self._compile()
+        self.encode_arrays = self._compile_arrays()
+
+    def _compile(self):
+        # Builds encode(env, neighbours) for this layout
+        packed = ' | '.join(f"({FEATURES[f].expression}) << {self.shifts[f]}"
+                            for f in self.features)
+        source = (
+            "def encode(env, neighbours):\n"
+            "    cell_s, cell_r, cell_l = neighbours\n"
+            "    occupancy = env.occupancy\n"
+            "    head_x, head_y = env.snake_pos\n"
+            "    fx, fy = env.food_pos\n"
+            "    direction = env.direction\n"
+            "    cell_dist = (abs(head_x - fx) + abs(head_y - fy)) // 10\n"
+            "    length = len(env.snake_body)\n"
+            f"    return {packed}\n"
+        )
+        namespace = {'DIR_CODE': DIR_CODE}
+        exec(compile(source, f"<encoder {self.name}>", 'exec'), namespace)
+        return namespace['encode']
+
+    def _compile_arrays(self):
+        # Builds encode_arrays(**ARRAY_NAMES) -> int64 state of every game
+        packed = ' | '.join(
+            f"np.asarray({FEATURES[f].array_expression}, dtype=np.int64) << {self.shifts[f]}"
+            for f in self.features)
+        source = (
+            f"def encode_arrays({', '.join(ARRAY_NAMES)}):\n"
+            f"    return {packed}\n"
+        )
+        namespace = {'np': np}
+        exec(compile(source, f"<array encoder {self.name}>", 'exec'), namespace)
+        return namespace['encode_arrays']
+
+    def describe(self):
+        # "bits 11 = danger_straight" style lines, highest bits first
+        lines = []
+        for f in self.features:
+            low, high = self.shifts[f], self.shifts[f] + FEATURES[f].bits - 1
+            bits = f"bit {low}" if low == high else f"bits {high}-{low}"
+            lines.append(f"{bits} = {f}")
+        return lines
+
+
+ENCODERS = {}
+
+
+def register_encoder(name, features, encoder_id=None):
+    encoder = StateEncoder(name, features, encoder_id)
+    for other in ENCODERS.values():
+        if other.id == encoder.id and other.name != name:
+            raise ValueError(f"encoder {name} has the same id as {other.name}")
+    ENCODERS[name] = encoder
+    return encoder
+
+
+def get_encoder(encoder):
+    # Accepts a registered name or a StateEncoder
+    if isinstance(encoder, StateEncoder):
+        return encoder
+    try:
+        return ENCODERS[encoder]
+    except KeyError:
+        raise ValueError(f"unknown state encoder {encoder!r}; "
+                         f"registered: {', '.join(sorted(ENCODERS))}") from None
+
+
+def encoder_by_id(encoder_id):
+    for encoder in ENCODERS.values():
+        if encoder.id == encoder_id:
+            return encoder
+    raise ValueError(f"no registered state encoder has id {encoder_id}")
+
+
+# The phase two layout (11 bits, 2048 states)
+register_encoder('phase_two', (
+    'danger_straight', 'danger_right', 'danger_left',
+    'food_left', 'food_right', 'food_up', 'food_down',
+    'direction', 'distance_bucket'), encoder_id=2)
+# The phase three layout (12 bits, 4096 states); id 1 is the encoder
+# version Q-tables were saved with before the registry existed
+register_encoder('phase_three', (
+    'danger_straight', 'danger_right', 'danger_left', 'body_collision',
+    'food_left', 'food_right', 'food_up', 'food_down',
+    'direction', 'distance_bucket'), encoder_id=1)
+# Phase three plus the body length (14 bits, 16384 states)
+register_encoder('phase_three_length', (
+    'danger_straight', 'danger_right', 'danger_left', 'body_collision',
+    'food_left', 'food_right', 'food_up', 'food_down',
+    'direction', 'distance_bucket', 'length_bucket'), encoder_id=3)
+
+DEFAULT_ENCODER = 'phase_three'
@@ -0,0 +1,253 @@
+"""
+Snake Eater episode log
+Append-only binary log of played episodes and a deterministic replayer
+Machine Learning Classes - University Carlos III of Madrid
+
+Usage (from the practice-2 folder):
+    python "phase three/episode_log.py" episodes.log --list
+    python "phase three/episode_log.py" episodes.log --episode 17 --start 500 --fps 20
+
+Every record holds the position of the food random stream at the start of
+the episode plus one byte per action; optionally the state and reward of
+every step. Replaying the actions through SnakeGameEnv from that position
+rebuilds the episode exactly.
+"""
+import argparse
+import os
+import struct
+from array import array
+
+import numpy as np
+
+from encoders import encoder_by_id
+from rng import RandomStream
+from snake_env import SnakeGameEnv
+
+MAGIC = b'SNEP'
+# magic, episode, rng state, rng increment, rng block index, rng block size,
+# frame size x, frame size y, growing body, flags, steps, score, total reward,
+# state encoder id
+RECORD = struct.Struct('<4sQ16s16sIIHHBBIIdI')
+HAS_STATES = 1
+HAS_REWARDS = 2
+# states are stored as uint32 instead of uint16 (encodings over 16 bits)
+WIDE_STATES = 4
+
+
+class EpisodeRecorder:
+    def __init__(self, filename, record_states=False, record_rewards=False):
+        # Records are appended to filename, which is created if needed
+        self.file = open(filename, 'ab')
+        self.record_states = record_states
+        self.record_rewards = record_rewards
+
+    def begin_episode(self, episode, env):
+        # Must be called before env.reset(), which draws the first food
+        self.episode = episode
+        self.env_params = (env.frame_size_x, env.frame_size_y, env.growing_body)
+        self.encoder = env.encoder
+        self.rng_position = env.rng.tell()
+        self.rng_block_size = env.rng.block_size
+        self.actions = bytearray()
+        self.states = array('I' if self.encoder.bits > 16 else 'H')
+        self.rewards = array('f')
+
+    def step(self, action, state, reward):
+        # state is the one the action was chosen in
+        self.actions.append(action)
+        if self.record_states:
+            self.states.append(state)
+        if self.record_rewards:
+            self.rewards.append(reward)
+
+    def end_episode(self, score, total_reward):
+        rng_state, rng_inc, rng_pos = self.rng_position
+        flags = ((HAS_STATES if self.record_states else 0)
+                 | (HAS_REWARDS if self.record_rewards else 0)
+                 | (WIDE_STATES if self.states.itemsize > 2 else 0))
+        frame_size_x, frame_size_y, growing_body = self.env_params
+        self.file.write(RECORD.pack(MAGIC, self.episode, rng_state.to_bytes(16, 'little'),
+                                    rng_inc.to_bytes(16, 'little'), rng_pos, self.rng_block_size,
+                                    frame_size_x, frame_size_y, growing_body, flags,
+                                    len(self.actions), score, total_reward, self.encoder.id))
+        self.file.write(self.actions)
+        if self.record_states:
+            self.file.write(self.states.tobytes())
+        if self.record_rewards:
+            self.file.write(self.rewards.tobytes())
+
+    def close(self):
+        self.file.close()
+
+
+class Episode:
+    def __init__(self, header, actions, states=None, rewards=None):
+        (_, self.episode, rng_state, rng_inc, rng_pos, self.rng_block_size,
+         self.frame_size_x, self.frame_size_y, growing_body, _, self.steps,
+         self.score, self.total_reward, encoder_id) = header
+        self.encoder = encoder_by_id(encoder_id)
+        self.rng_position = (int.from_bytes(rng_state, 'little'),
+                             int.from_bytes(rng_inc, 'little'), rng_pos)
+        self.growing_body = bool(growing_body)
+        self.actions = actions
+        self.states = states
+        self.rewards = rewards
+
+
+class EpisodeLog:
+    def __init__(self, filename):
+        # Reads only the record headers; episodes are loaded on demand
+        self.filename = filename
+        self.offsets = []
+        self.headers = []
+        with open(filename, 'rb') as f:
+            file_size = os.fstat(f.fileno()).st_size
+            while True:
+                offset = f.tell()
+                raw = f.read(RECORD.size)
+                if len(raw) < RECORD.size:
+                    break
+                header = RECORD.unpack(raw)
+                if header[0] != MAGIC:
+                    raise ValueError(f"{filename}: bad record at byte {offset}")
+                end = offset + RECORD.size + self._payload_size(header)
+                if end > file_size:
+                    break  # last record cut short by a crash
+                f.seek(end)
+                self.offsets.append(offset)
+                self.headers.append(header)
+
+    @staticmethod
+    def _payload_size(header):
+        flags, steps = header[9], header[10]
+        state_size = 4 if flags & WIDE_STATES else 2
+        return (steps + (state_size * steps if flags & HAS_STATES else 0)
+                + (4 * steps if flags & HAS_REWARDS else 0))
+
+    def __len__(self):
+        return len(self.headers)
+
+    def __getitem__(self, i):
+        header = self.headers[i]
+        flags, steps = header[9], header[10]
+        with open(self.filename, 'rb') as f:
+            f.seek(self.offsets[i] + RECORD.size)
+            actions = f.read(steps)
+            state_type = np.dtype('<u4' if flags & WIDE_STATES else '<u2')
+            states = (np.frombuffer(f.read(state_type.itemsize * steps), dtype=state_type)
+                      if flags & HAS_STATES else None)
+            rewards = np.frombuffer(f.read(4 * steps), dtype='<f4') if flags & HAS_REWARDS else None
+        return Episode(header, actions, states, rewards)
+
+    def find(self, episode):
+        # Index of the last record of the given episode number
+        for i in range(len(self.headers) - 1, -1, -1):
+            if self.headers[i][1] == episode:
+                return i
+        raise KeyError(f"episode {episode} is not in {self.filename}")
+
+
+class Replayer:
+    def __init__(self, episode, keyframe_every=256):
+        # keyframe_every: steps between the snapshots seek() jumps from
+        self.episode = episode
+        self.keyframe_every = keyframe_every
+        rng = RandomStream(block_size=episode.rng_block_size)
+        rng.seek(episode.rng_position)
+        self.env = SnakeGameEnv(episode.frame_size_x, episode.frame_size_y,
+                                episode.growing_body, rng=rng, encoder=episode.encoder)
+        self.state = self.env.get_state()
+        self.step_index = 0
+        # step index -> (environment snapshot, state at that step)
+        self.keyframes = {0: (self.env.snapshot(), self.state)}
+
+    def step(self):
+        # Plays the next recorded action; returns (state, reward, game_over)
+        k = self.step_index
+        episode = self.episode
+        if episode.states is not None and episode.states[k] != self.state:
+            raise ValueError(f"replay of episode {episode.episode} diverged at step {k}")
+        self.state, reward, game_over = self.env.step(episode.actions[k])
+        self.step_index = k + 1
+        if self.step_index % self.keyframe_every == 0 and self.step_index not in self.keyframes:
+            self.keyframes[self.step_index] = (self.env.snapshot(), self.state)
+        return self.state, reward, game_over
+
+    def seek(self, k):
+        # Puts the game in the position after k steps, starting from the
+        # nearest snapshot at or before step k
+        if not 0 <= k <= self.episode.steps:
+            raise IndexError(f"step {k} is outside the episode (0..{self.episode.steps})")
+        start = k - k % self.keyframe_every
+        while start not in self.keyframes:
+            start -= self.keyframe_every
+        if not start <= self.step_index <= k:
+            snapshot, self.state = self.keyframes[start]
+            self.env.restore(snapshot)
+            self.step_index = start
+        while self.step_index < k:
+            self.step()
+
+
+def verify(episode):
+    # Replays the whole episode and checks it against the recorded results
+    replayer = Replayer(episode)
+    total_reward = 0.0
+    for k in range(episode.steps):
+        state, reward, game_over = replayer.step()
+        if episode.rewards is not None and episode.rewards[k] != np.float32(reward):
+            raise ValueError(f"replay of episode {episode.episode} diverged at step {k}")
+        total_reward += reward
+    if (replayer.env.score, total_reward) != (episode.score, episode.total_reward):
+        raise ValueError(f"replay of episode {episode.episode} ended with score "
+                         f"{replayer.env.score}, recorded {episode.score}")
+
+
+def show(episode, start=0, fps=20):
+    # Plays the episode in the game window, starting after `start` steps
+    from renderer import Renderer
+
+    replayer = Replayer(episode)
+    replayer.seek(start)
+    renderer = Renderer(episode.frame_size_x, episode.frame_size_y, fps)
+    renderer.begin_episode(0)
+    renderer.frame(replayer.env.get_body(), replayer.env.get_food())
+    game_over = False
+    while replayer.step_index < episode.steps and not game_over:
+        state, reward, game_over = replayer.step()
+        if not game_over:
+            renderer.frame(replayer.env.get_body(), replayer.env.get_food())
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="List, check or replay recorded episodes.")
+    parser.add_argument('log', help="episode log written by train.py --record")
+    parser.add_argument('--list', action='store_true', help="list the recorded episodes")
+    parser.add_argument('--verify', action='store_true',
+                        help="replay every episode and check it against the recording")
+    parser.add_argument('--episode', type=int, default=None,
+                        help="episode number to show in the game window")
+    parser.add_argument('--start', type=int, default=0,
+                        help="step to start showing the episode from (default: 0)")
+    parser.add_argument('--fps', type=int, default=20,
+                        help="replay speed in steps per second (default: 20)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    log = EpisodeLog(args.log)
+    if args.list:
+        print(f"{'episode':>9}{'steps':>9}{'score':>8}{'reward':>10}")
+        for header in log.headers:
+            print(f"{header[1]:>9}{header[10]:>9}{header[11]:>8}{header[12]:>10.1f}")
+    if args.verify:
+        for i in range(len(log)):
+            verify(log[i])
+        print(f"{len(log)} episodes replay exactly")
+    if args.episode is not None:
+        show(log[log.find(args.episode)], args.start, args.fps)
+
+
+if __name__ == '__main__':
+    main()
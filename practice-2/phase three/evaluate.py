@@ -0,0 +1,208 @@
+"""
+Snake Eater policy evaluation
+Plays saved Q-tables greedily over many seeded episodes in a process pool
+Machine Learning Classes - University Carlos III of Madrid
+
+Usage (from the practice-2 folder):
+    python "phase three/evaluate.py" "phase two/q_table.txt" "phase three/q_table.bin" --episodes 2000
+
+Every episode ends when the snake crashes, when it reaches the step cap,
+or when the game comes back to a position it has already been in since
+the last time it ate. The greedy policy and the game are deterministic
+between two meals, so such a repeat means the snake would circle forever.
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+
+import numpy as np
+
+from q_table_io import load_table
+from sparse_table import SparseQTable
+from snake_env import SnakeGameEnv
+from rng import RandomStream
+from cli import parse_board
+
+OUTCOMES = ('crash', 'cap', 'loop')
+
+
+def load_greedy_table(filename):
+    # Q-table of filename as a dense array, and the name of its encoder
+    table, encoder = load_table(filename, mmap=True)
+    if isinstance(table, SparseQTable):
+        table = table.to_dense()
+    return table, encoder.name
+
+
+def greedy_actions(table):
+    # Greedy action of every state, as a list for fast indexing; worked out
+    # once per table and shared by all the episodes played with it
+    return table.argmax(axis=1).tolist()
+
+
+def play_episode(greedy, encoder, seed_seq, frame_size_x=300, frame_size_y=300,
+                 growing_body=False, max_steps=10000):
+    # Plays one greedy episode and returns (score, length, steps, outcome)
+    # greedy: greedy_actions() of the table being played
+    env = SnakeGameEnv(frame_size_x, frame_size_y, growing_body, rng=RandomStream(seed_seq),
+                       encoder=encoder)
+    state = env.reset()
+    seen = set()
+    steps = 0
+    outcome = 'cap'
+    while steps < max_steps:
+        # The position itself, not its hash: a hash collision would end
+        # the episode as a false loop
+        key = (env.direction, env.food_pos[0], env.food_pos[1],
+               tuple(map(tuple, env.snake_body)))
+        if key in seen:
+            outcome = 'loop'
+            break
+        seen.add(key)
+        score = env.score
+        state, reward, game_over = env.step(greedy[state])
+        steps += 1
+        if game_over:
+            outcome = 'crash'
+            break
+        if env.score != score:
+            # new food: positions before the meal can't repeat the same way
+            seen.clear()
+    return env.score, len(env.snake_body), steps, outcome
+
+
+_tables = None
+
+
+def _init_worker(filenames):
+    global _tables
+    _tables = []
+    for f in filenames:
+        table, encoder = load_greedy_table(f)
+        _tables.append((greedy_actions(table), encoder))
+
+
+def _play_chunk(args):
+    table_index, episodes, entropy, env_params, max_steps = args
+    greedy, encoder = _tables[table_index]
+    # Episode i uses the same seed for every table, so all tables play
+    # the same food sequences
+    return table_index, [
+        play_episode(greedy, encoder, np.random.SeedSequence(entropy, spawn_key=(i,)),
+                     *env_params, max_steps=max_steps)
+        for i in episodes
+    ]
+
+
+def evaluate(filenames, num_episodes=1000, frame_size_x=300, frame_size_y=300,
+             growing_body=False, max_steps=10000, workers=None, seed=None, chunk_size=50):
+    # Returns {filename: {'encoder': name, 'score': array, 'length': array,
+    # 'steps': array, 'outcome': list}} with one entry per episode
+    entropy = np.random.SeedSequence(seed).entropy
+    env_params = (frame_size_x, frame_size_y, growing_body)
+    tasks = [(t, range(start, min(start + chunk_size, num_episodes)), entropy, env_params, max_steps)
+             for t in range(len(filenames))
+             for start in range(0, num_episodes, chunk_size)]
+    workers = workers or os.cpu_count() or 1
+    # Loading every table here first reports a bad file before any work starts
+    encoders = [load_greedy_table(f)[1] for f in filenames]
+
+    episodes = {t: [] for t in range(len(filenames))}
+    if workers == 1:
+        _init_worker(filenames)
+        for table_index, chunk in map(_play_chunk, tasks):
+            episodes[table_index].extend(chunk)
+    else:
+        with mp.Pool(workers, initializer=_init_worker, initargs=(filenames,)) as pool:
+            # imap keeps the chunks in order, so episode i is row i
+            for table_index, chunk in pool.imap(_play_chunk, tasks):
+                episodes[table_index].extend(chunk)
+
+    results = {}
+    for t, filename in enumerate(filenames):
+        score, length, steps, outcome = zip(*episodes[t])
+        results[filename] = {
+            'encoder': encoders[t],
+            'score': np.array(score),
+            'length': np.array(length),
+            'steps': np.array(steps),
+            'outcome': list(outcome),
+        }
+    return results
+
+
+def summarize(values):
+    values = np.asarray(values, dtype=np.float64)
+    p10, p50, p90 = np.percentile(values, [10, 50, 90])
+    return {'mean': values.mean(), 'std': values.std(), 'min': values.min(),
+            'p10': p10, 'p50': p50, 'p90': p90, 'max': values.max()}
+
+
+def report(results):
+    # Summary per table: distributions of score, length and steps plus the
+    # share of episodes that ended in each way
+    summary = {}
+    for filename, r in results.items():
+        n = len(r['outcome'])
+        summary[filename] = {
+            'episodes': n,
+            'encoder': r['encoder'],
+            'score': summarize(r['score']),
+            'length': summarize(r['length']),
+            'steps': summarize(r['steps']),
+            'outcomes': {o: r['outcome'].count(o) / n for o in OUTCOMES},
+        }
+    return summary
+
+
+def format_report(summary):
+    lines = []
+    for filename, s in summary.items():
+        lines.append(f"{filename} ({s['encoder']} encoder, {s['episodes']} episodes)")
+        lines.append(f"  {'':<8}{'mean':>9}{'std':>9}{'min':>8}{'p10':>8}{'p50':>8}{'p90':>8}{'max':>8}")
+        for name in ('score', 'length', 'steps'):
+            d = s[name]
+            lines.append(f"  {name:<8}{d['mean']:>9.1f}{d['std']:>9.1f}{d['min']:>8.0f}"
+                         f"{d['p10']:>8.0f}{d['p50']:>8.0f}{d['p90']:>8.0f}{d['max']:>8.0f}")
+        lines.append("  ended by " + ", ".join(f"{o} {share:.1%}" for o, share in s['outcomes'].items()))
+    return "\n".join(lines)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Evaluate saved Q-tables with a greedy policy.")
+    parser.add_argument('tables', nargs='+',
+                        help="Q-table files (.bin, or .txt with 2048 rows = phase two, 4096 = phase three)")
+    parser.add_argument('--episodes', type=int, default=1000,
+                        help="episodes per table (default: 1000)")
+    parser.add_argument('--board', type=parse_board, default=(300, 300),
+                        help="board size in cells, e.g. 30x30 (default: 30x30)")
+    parser.add_argument('--growing', action=argparse.BooleanOptionalAction, default=False,
+                        help="make the snake grow when it eats (default: off)")
+    parser.add_argument('--max-steps', type=int, default=10000,
+                        help="step cap per episode (default: 10000)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument('--seed', type=int, default=None,
+                        help="seed for the food positions; same seed, same episodes")
+    parser.add_argument('--json', default=None,
+                        help="write the summary and the per-episode results to this file")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    frame_size_x, frame_size_y = args.board
+    results = evaluate(args.tables, args.episodes, frame_size_x, frame_size_y,
+                       args.growing, args.max_steps, args.workers, args.seed)
+    summary = report(results)
+    print(format_report(summary))
+    if args.json:
+        episodes = {f: {k: (v.tolist() if isinstance(v, np.ndarray) else v) for k, v in r.items()}
+                    for f, r in results.items()}
+        with open(args.json, 'w') as f:
+            json.dump({'summary': summary, 'episodes': episodes}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
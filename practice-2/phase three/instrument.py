@@ -0,0 +1,111 @@
+"""
+Snake Eater training instrumentation
+Opt-in per-phase timers and counters for the training loop
+Machine Learning Classes - University Carlos III of Madrid
+
+Timing works by replacing methods (env.step, ql.update_q_table, ...) with
+timed wrappers. When instrumentation is disabled nothing is replaced, so
+the training loop runs exactly the same code as without it.
+"""
+import json
+import time
+
+
+class PhaseStats:
+    __slots__ = ('count', 'total', 'samples', 'window')
+
+    def __init__(self, window):
+        self.count = 0
+        self.total = 0.0
+        # Durations of the last `window` calls, for the percentiles
+        self.samples = [0.0] * window
+        self.window = window
+
+    def add(self, seconds):
+        self.samples[self.count % self.window] = seconds
+        self.count += 1
+        self.total += seconds
+
+    def percentile(self, q):
+        recent = sorted(self.samples[:min(self.count, self.window)])
+        if not recent:
+            return 0.0
+        return recent[min(len(recent) - 1, int(q * len(recent)))]
+
+
+class Instrumentation:
+    def __init__(self, enabled=False, summary_every=0, window=4096):
+        # summary_every: print a summary every N episodes (0 disables it)
+        # window: number of recent calls per phase kept for p50/p99
+        self.enabled = enabled
+        self.summary_every = summary_every
+        self.window = window
+        self.phases = {}
+        self.counters = {}
+        self.start = time.perf_counter()
+
+    def wrap(self, owner, name, phase=None):
+        # Replaces owner.name with a timed version recorded under phase
+        if self.enabled:
+            setattr(owner, name, self.wrap_function(getattr(owner, name), phase or name))
+
+    def wrap_function(self, fn, phase):
+        # Timed version of fn, or fn itself when disabled
+        if not self.enabled:
+            return fn
+        stats = self._phase(phase)
+        perf_counter = time.perf_counter
+
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            result = fn(*args, **kwargs)
+            stats.add(perf_counter() - start)
+            return result
+
+        return timed
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def episode_done(self, episode):
+        if not self.enabled:
+            return
+        self.count('episodes')
+        if self.summary_every and episode % self.summary_every == 0:
+            print(self.summary(f"after episode {episode}"))
+
+    def report(self):
+        # Machine-readable statistics of the run so far
+        wall = time.perf_counter() - self.start
+        phases = {}
+        for name, stats in self.phases.items():
+            phases[name] = {
+                'calls': stats.count,
+                'total_s': stats.total,
+                'share': stats.total / wall if wall else 0.0,
+                'calls_per_s': stats.count / wall if wall else 0.0,
+                'p50_s': stats.percentile(0.50),
+                'p99_s': stats.percentile(0.99),
+            }
+        return {'wall_s': wall, 'phases': phases, 'counters': dict(self.counters)}
+
+    def summary(self, title=''):
+        report = self.report()
+        lines = [f"-- timing {title} ({report['wall_s']:.1f} s wall) --",
+                 f"{'phase':<24}{'calls':>12}{'calls/s':>12}{'share':>8}{'p50 us':>10}{'p99 us':>10}"]
+        for name, p in sorted(report['phases'].items(), key=lambda item: -item[1]['total_s']):
+            lines.append(f"{name:<24}{p['calls']:>12}{p['calls_per_s']:>12.0f}{p['share']:>8.1%}"
+                         f"{p['p50_s'] * 1e6:>10.1f}{p['p99_s'] * 1e6:>10.1f}")
+        if report['counters']:
+            lines.append("counters: " + ", ".join(f"{k}={v}" for k, v in sorted(report['counters'].items())))
+        return "\n".join(lines)
+
+    def dump(self, filename):
+        with open(filename, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+
+    def _phase(self, name):
+        if name not in self.phases:
+            self.phases[name] = PhaseStats(self.window)
+        return self.phases[name]
@@ -0,0 +1,116 @@
+"""
+Snake Eater Parallel Q-learning
+Several worker processes train on one Q-table held in shared memory
+Machine Learning Classes - University Carlos III of Madrid
+
+Workers update the table lock-free (Hogwild style): every worker runs its
+own SnakeGameEnv episodes and writes straight into the shared table.
+The parent process only hands out episodes, logs and saves checkpoints.
+"""
+import multiprocessing as mp
+import signal
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from checkpoint import CheckpointWriter
+from encoders import DEFAULT_ENCODER, get_encoder
+from q_learning import QLearning
+from rng import RandomStream
+from snake_env import SnakeGameEnv
+
+
+def train_parallel(workers, num_episodes=5000, frame_size_x=300, frame_size_y=300,
+                   growing_body=False, encoder=DEFAULT_ENCODER,
+                   q_table_file="phase three/q_table.bin", log_every=1,
+                   checkpoint_every=1, checkpoint_seconds=None, keep_checkpoints=0,
+                   seed=None, **ql_params):
+    encoder = get_encoder(encoder)
+    ql = QLearning(n_states=encoder.n_states, n_actions=4, filename=q_table_file,
+                   encoder_id=encoder.id, convert_text=True, **ql_params)
+    shm = shared_memory.SharedMemory(create=True, size=ql.q_table.nbytes)
+    try:
+        table = np.ndarray(ql.q_table.shape, dtype=ql.q_table.dtype, buffer=shm.buf)
+        table[:] = ql.q_table
+        ql.q_table = table
+        checkpoints = CheckpointWriter(ql, checkpoint_every, checkpoint_seconds, keep_checkpoints)
+        checkpoints.install_signal_handler()
+
+        claimed = mp.Value('q', 0)
+        finished = mp.Value('q', 0)
+        stop = mp.Event()
+        env_params = dict(frame_size_x=frame_size_x, frame_size_y=frame_size_y,
+                          growing_body=growing_body, encoder=encoder.name)
+        # Every worker gets its own independent stream derived from the seed
+        streams = RandomStream(seed).spawn(workers)
+        processes = [
+            mp.Process(target=_worker, name=f'snake-worker-{i}',
+                       args=(shm.name, table.shape, table.dtype.str, env_params, ql_params,
+                             streams[i].seed_seq, num_episodes, log_every,
+                             claimed, finished, stop))
+            for i in range(workers)
+        ]
+        for p in processes:
+            p.start()
+        try:
+            while any(p.is_alive() for p in processes):
+                time.sleep(0.05)
+                checkpoints.episode_done(finished.value)
+        finally:
+            stop.set()
+            for p in processes:
+                p.join()
+            checkpoints.close()
+            ql.q_table = table.copy()
+            del table
+    finally:
+        shm.close()
+        shm.unlink()
+    # The table is saved either way, but a worker that died (e.g. on an
+    # exception) means fewer episodes were trained than asked for
+    failed = [f"{p.name} (exit code {p.exitcode})" for p in processes if p.exitcode != 0]
+    if failed:
+        raise RuntimeError(f"training workers failed: {', '.join(failed)}; "
+                           f"{finished.value} of {num_episodes} episodes finished")
+    return ql
+
+
+def _worker(shm_name, shape, dtype, env_params, ql_params, seed_seq,
+            num_episodes, log_every, claimed, finished, stop):
+    # Ctrl+C is handled by the parent, which tells the workers to stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    env_rng, ql_rng = RandomStream(seed_seq).spawn(2)
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        table = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        ql = QLearning(n_states=shape[0], n_actions=shape[1], q_table=table,
+                       rng=ql_rng, **ql_params)
+        env = SnakeGameEnv(rng=env_rng, **env_params)
+        allowed_actions = [0, 1, 2, 3]
+
+        while not stop.is_set():
+            with claimed.get_lock():
+                if claimed.value >= num_episodes:
+                    break
+                claimed.value += 1
+                episode = claimed.value
+
+            state = env.reset()
+            total_reward = 0
+            game_over = False
+            while not game_over:
+                action = ql.choose_action(state, allowed_actions)
+                next_state, reward, game_over = env.step(action)
+                ql.update_q_table(state, action, reward, next_state)
+                state = next_state
+                total_reward += reward
+
+            with finished.get_lock():
+                finished.value += 1
+            if episode % log_every == 0:
+                print(f"Episode {episode}, Total reward: {total_reward}", flush=True)
+        del ql, table
+    finally:
+        shm.close()
@@ -0,0 +1,107 @@
+"""
+Snake Eater compiled policy
+Greedy policy of a Q-table packed into 2 bits per state
+Machine Learning Classes - University Carlos III of Madrid
+
+Usage (from the practice-2 folder):
+    python "phase three/policy.py" "phase three/q_table.bin" "phase three/policy.bin"
+
+A compiled policy only answers "which action in this state", so playing
+with it needs no Q-values, random numbers or argmax. The phase three
+policy file is 1 KB plus a 32-byte header.
+"""
+import argparse
+import os
+import struct
+
+import numpy as np
+
+from encoders import DEFAULT_ENCODER, ENCODERS, encoder_by_id, get_encoder
+from q_table_io import load_table
+from sparse_table import SparseQTable
+
+MAGIC = b'SNAKEPL\x00'
+# magic, n_states, encoder id
+HEADER = struct.Struct('<8sQI')
+HEADER_SIZE = 32
+
+
+def compile_policy(q_table):
+    # Greedy action of every state (ties go to the lowest action, like
+    # np.argmax), four states per byte
+    if isinstance(q_table, SparseQTable):
+        q_table = q_table.to_dense()
+    if q_table.shape[1] > 4:
+        raise ValueError("a packed policy holds at most 4 actions")
+    actions = np.argmax(q_table, axis=1).astype(np.uint8)
+    actions = np.concatenate([actions, np.zeros(-len(actions) % 4, dtype=np.uint8)])
+    quads = actions.reshape(-1, 4)
+    return quads[:, 0] | quads[:, 1] << 2 | quads[:, 2] << 4 | quads[:, 3] << 6
+
+
+class GreedyPolicy:
+    def __init__(self, packed, n_states, encoder=DEFAULT_ENCODER):
+        # encoder: the state encoder the policy was compiled for
+        self.packed = np.asarray(packed, dtype=np.uint8)
+        self.n_states = n_states
+        self.encoder = get_encoder(encoder)
+        # One byte per state in memory, so a lookup is a single index
+        unpacked = np.stack([self.packed >> shift & 3 for shift in (0, 2, 4, 6)], axis=1)
+        self.table = unpacked.reshape(-1)[:n_states].copy()
+        self._actions = self.table.tobytes()
+
+    def action(self, state):
+        return self._actions[state]
+
+    def actions(self, states):
+        # Actions for a batch of states, e.g. one per VecSnakeEnv game
+        return self.table[states]
+
+    @classmethod
+    def from_q_table(cls, q_table, encoder=DEFAULT_ENCODER):
+        return cls(compile_policy(q_table), q_table.shape[0], encoder)
+
+
+def save_policy(filename, policy):
+    with open(filename, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, policy.n_states, policy.encoder.id).ljust(HEADER_SIZE, b'\x00'))
+        f.write(policy.packed.tobytes())
+
+
+def load_greedy_policy(filename):
+    with open(filename, 'rb') as f:
+        raw = f.read()
+    if len(raw) < HEADER_SIZE or raw[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{filename} is not a compiled policy")
+    magic, n_states, encoder_id = HEADER.unpack_from(raw)
+    encoder = encoder_by_id(encoder_id)
+    if n_states != encoder.n_states:
+        raise ValueError(f"{filename} holds {n_states} states, but encoder "
+                         f"{encoder.name} has {encoder.n_states}")
+    packed = np.frombuffer(raw, dtype=np.uint8, offset=HEADER_SIZE)
+    if len(packed) != (n_states + 3) // 4:
+        raise ValueError(f"{filename} is truncated")
+    return GreedyPolicy(packed, n_states, encoder)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile a Q-table into a packed greedy policy.")
+    parser.add_argument('q_table', help="Q-table to compile (.bin or .txt)")
+    parser.add_argument('output', help="policy file to write")
+    parser.add_argument('--encoder', choices=sorted(ENCODERS), default=None,
+                        help="state encoder the table was trained with (default: the one in "
+                             "a .bin header, or the one matching the rows of a .txt table)")
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.q_table):
+        parser.error(f"{args.q_table} does not exist")
+    try:
+        table, encoder = load_table(args.q_table, args.encoder, mmap=True)
+    except ValueError as e:
+        parser.error(str(e))
+    policy = GreedyPolicy.from_q_table(table, encoder)
+    save_policy(args.output, policy)
+    print(f"{args.output}: {policy.n_states} states in {len(policy.packed)} bytes")
+
+
+if __name__ == '__main__':
+    main()
@@ -5,12 +5,17 @@ Last modification in April 2024 by José Luis Perán
 Machine Learning Classes - University Carlos III of Madrid
 """
 import numpy as np
-import random
 import json
+import os
 import time
 
+from q_table_io import binary_path, text_path, save_table, read_table
+from rng import RandomStream
+from sparse_table import SparseQTable
+from encoders import DEFAULT_ENCODER, get_encoder
+
 class QLearning:
-    def __init__(self, n_states, n_actions, alpha=0.1, gamma=0.99, epsilon=0.7, epsilon_min=0.01, epsilon_decay=0.995):
+    def __init__(self, n_states, n_actions, alpha=0.1, gamma=0.99, epsilon=0.7, epsilon_min=0.01, epsilon_decay=0.995, filename="phase three/q_table.bin", q_table=None, rng=None, dtype=np.float64, sparse=False, encoder_id=None, convert_text=False):
         self.n_states = n_states
         self.n_actions = n_actions
         self.alpha = alpha
@@ -18,41 +23,103 @@ class QLearning:
         self.epsilon = epsilon
         self.epsilon_min = epsilon_min
         self.epsilon_decay = epsilon_decay
-        self.load_q_table()
+        self.filename = binary_path(filename)
+        # rng: RandomStream used for exploration (a fresh one by default)
+        self.rng = rng if rng is not None else RandomStream()
+        # dtype: float64, float32 or float16 values
+        # sparse: store only the rows of updated states (SparseQTable)
+        self.dtype = np.dtype(dtype)
+        self.sparse = sparse
+        # encoder_id: id of the state encoder the table is trained with,
+        # saved with the table so it is never loaded with another encoding
+        self.encoder_id = encoder_id if encoder_id is not None else get_encoder(DEFAULT_ENCODER).id
+        # convert_text: save a table loaded from q_table.txt as q_table.bin;
+        # only training asks for it, playing never writes to disk
+        self.convert_text = convert_text
+        if q_table is None:
+            self.load_q_table()
+        else:
+            # Use an existing table (e.g. one shared between processes)
+            self.q_table = q_table
 
     def choose_action(self, state, allowed_actions):
-        if np.random.uniform(0, 1) < self.epsilon:
-            action = random.choice(allowed_actions)  # Explore
+        if self.rng.random() < self.epsilon:
+            action = self.rng.choice(allowed_actions)  # Explore
         else:
             action = np.argmax(self.q_table[state])  # Exploit
 
         self.epsilon = max(self.epsilon_min, self.epsilon_decay * self.epsilon)
         return action
 
+    def choose_actions(self, states):
+        # Epsilon-greedy actions for a batch of states (one per environment).
+        # Epsilon decays once per call, so every environment follows the
+        # same schedule as a single game does with choose_action.
+        states = np.asarray(states)
+        actions = np.argmax(self.q_table[states], axis=1)
+        explore = self.rng.generator.random(states.size) < self.epsilon
+        n_explore = int(explore.sum())
+        if n_explore:
+            actions[explore] = self.rng.generator.integers(0, self.n_actions, size=n_explore)
+
+        self.epsilon = max(self.epsilon_min, self.epsilon_decay * self.epsilon)
+        return actions
+
     def update_q_table(self, state, action, reward, next_state):
         # Update the current Q-value using the Q-learning formula
         # if terminal_state:
         # Q(state,action) <- (1-self.alpha) Q(state,action) + self.alpha * (r + 0)
         # else:
         # Q(state,action) <- (1-self.alpha) Q(state,action) + self.alpha * (r + self.discount * max a' Q(nextState, a'))
-        current_q = self.q_table[state][action]
+        # The update is done in double precision whatever the table dtype,
+        # so float32/float16 values are only rounded once, when stored
+        current_q = float(self.q_table[state, action])
         # if terminal (death), no future reward
         if reward < 0:
             max_future_q = 0
         else:
-            max_future_q = np.max(self.q_table[next_state])
+            max_future_q = float(np.max(self.q_table[next_state]))
         # Q-learning update rule
-        self.q_table[state][action] = (
+        target = reward + self.gamma * max_future_q
+        self.q_table[state, action] = (
             (1 - self.alpha) * current_q +
-            self.alpha * (reward + self.gamma * max_future_q)
+            self.alpha * target
         )
+        # TD error; the Q-value moved by alpha times this
+        return target - current_q
+
+    def save_q_table(self, filename=None):
+        save_table(filename or self.filename, self.q_table, self.encoder_id)
 
-    def save_q_table(self, filename="phase three/q_table.txt"):
-        np.savetxt(filename, self.q_table)
+    def load_q_table(self, filename=None):
+        filename = binary_path(filename or self.filename)
+        if os.path.exists(filename):
+            # Read into memory, not mapped: checkpoints are saved over this file
+            table = read_table(filename, self.n_states, self.n_actions, self.encoder_id)
+        else:
+            try:
+                # Table saved with np.savetxt, converted once when training
+                table = np.loadtxt(text_path(filename))
+                if self.convert_text:
+                    save_table(filename, table, self.encoder_id)
+            except IOError:
+                # If the file doesn't exist, initialize Q-table with zeros as per dimensions
+                table = (SparseQTable(self.n_states, self.n_actions, self.dtype) if self.sparse
+                         else np.zeros((self.n_states, self.n_actions), dtype=self.dtype))
+        self.q_table = self._convert(table)
 
-    def load_q_table(self, filename="phase three/q_table.txt"):
-        try:
-            self.q_table = np.loadtxt(filename)
-        except IOError:
-            # If the file doesn't exist, initialize Q-table with zeros as per dimensions
-            self.q_table = np.zeros((self.n_states, self.n_actions))
+    def _convert(self, table):
+        # The loaded table in the configured layout and dtype; a matching
+        # dense file stays memory-mapped
+        if isinstance(table, SparseQTable):
+            if not self.sparse:
+                return table.to_dense().astype(self.dtype, copy=False)
+            if table.dtype != self.dtype:
+                states, rows = table.states()
+                return SparseQTable.from_rows(self.n_states, states, rows.astype(self.dtype))
+            return table
+        if self.sparse:
+            return SparseQTable.from_dense(np.asarray(table, dtype=self.dtype))
+        if table.dtype != self.dtype:
+            return table.astype(self.dtype)
+        return table
@@ -0,0 +1,149 @@
+"""
+Snake Eater Q-table checkpoints
+Binary, memory-mappable Q-table files
+Machine Learning Classes - University Carlos III of Madrid
+
+File layout: a 64-byte little-endian header followed by the raw
+row-major (n_states, n_actions) table. Sparse tables store instead the
+sorted int64 indices of their n_stored states followed by those rows.
+"""
+import os
+import struct
+import tempfile
+
+import numpy as np
+
+from encoders import ENCODERS, encoder_by_id, get_encoder
+from sparse_table import SparseQTable
+
+MAGIC = b'SNAKEQT\x00'
+FORMAT_VERSION = 1
+# magic, format version, n_states, n_actions, encoder id, dtype string,
+# flags, n_stored (older files have zeros there, i.e. dense)
+HEADER = struct.Struct('<8sIQII8sIQ')
+HEADER_SIZE = 64
+SPARSE = 1
+
+
+def binary_path(filename):
+    # Binary file that goes with filename ("q_table.txt" -> "q_table.bin")
+    root, ext = os.path.splitext(filename)
+    return root + '.bin' if ext == '.txt' else filename
+
+
+def text_path(filename):
+    # Legacy np.savetxt file that goes with filename
+    return os.path.splitext(filename)[0] + '.txt'
+
+
+def read_header(filename):
+    with open(filename, 'rb') as f:
+        raw = f.read(HEADER_SIZE)
+    if len(raw) < HEADER_SIZE or raw[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{filename} is not a Q-table checkpoint")
+    (magic, version, n_states, n_actions, encoder_id, dtype,
+     flags, n_stored) = HEADER.unpack_from(raw)
+    if version != FORMAT_VERSION:
+        raise ValueError(f"{filename} uses checkpoint format {version}, expected {FORMAT_VERSION}")
+    return {
+        'n_states': n_states,
+        'n_actions': n_actions,
+        'encoder_id': encoder_id,
+        'dtype': np.dtype(dtype.rstrip(b'\x00').decode('ascii')),
+        'sparse': bool(flags & SPARSE),
+        'n_stored': n_stored,
+    }
+
+
+def save_table(filename, table, encoder_id):
+    # Writes the table to a temporary file next to filename and renames it
+    # over the old one, so an interrupted save never leaves a broken file.
+    n_states, n_actions = table.shape
+    if isinstance(table, SparseQTable):
+        states, rows = table.states()
+        payload = [states.astype('<i8'), np.ascontiguousarray(rows)]
+        header = HEADER.pack(MAGIC, FORMAT_VERSION, n_states, n_actions, encoder_id,
+                             table.dtype.str.encode('ascii'), SPARSE, len(states))
+    else:
+        payload = [np.ascontiguousarray(table)]
+        header = HEADER.pack(MAGIC, FORMAT_VERSION, n_states, n_actions, encoder_id,
+                             table.dtype.str.encode('ascii'), 0, 0)
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, tmp = tempfile.mkstemp(prefix='.q_table-', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(header.ljust(HEADER_SIZE, b'\x00'))
+            for array in payload:
+                f.write(array.data)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates the file private to the user; keep the usual mode
+        mode = os.stat(filename).st_mode if os.path.exists(filename) else 0o644
+        os.chmod(tmp, mode & 0o777)
+        os.replace(tmp, filename)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def read_table(filename, n_states, n_actions, encoder_id, mmap=False):
+    # Reads the table into memory. mmap=True maps it read-only instead, for
+    # callers that only read it (evaluate, policy): a mapping keeps the file
+    # open, and on Windows os.replace cannot save a checkpoint over it.
+    # Sparse files load as a SparseQTable.
+    header = read_header(filename)
+    if (header['n_states'], header['n_actions']) != (n_states, n_actions):
+        raise ValueError(
+            f"{filename} holds a {header['n_states']}x{header['n_actions']} table, "
+            f"expected {n_states}x{n_actions}")
+    if header['encoder_id'] != encoder_id:
+        raise ValueError(
+            f"{filename} was trained with state encoder id "
+            f"{header['encoder_id']}, expected {encoder_id}")
+    shape = (n_states, n_actions)
+    if header['sparse']:
+        n_stored = header['n_stored']
+        with open(filename, 'rb') as f:
+            f.seek(HEADER_SIZE)
+            states = np.fromfile(f, dtype='<i8', count=n_stored)
+            rows = np.fromfile(f, dtype=header['dtype'], count=n_stored * n_actions)
+        return SparseQTable.from_rows(n_states, states, rows.reshape(n_stored, n_actions))
+    if mmap:
+        return np.memmap(filename, dtype=header['dtype'], mode='r',
+                         offset=HEADER_SIZE, shape=shape)
+    with open(filename, 'rb') as f:
+        f.seek(HEADER_SIZE)
+        return np.fromfile(f, dtype=header['dtype'], count=n_states * n_actions).reshape(shape)
+
+
+def load_table(filename, encoder=None, mmap=False):
+    # Reads a binary or text Q-table without writing anything; returns the
+    # table and its state encoder. Binary tables name their encoder in the
+    # header, which must agree with encoder when one is given. Text tables
+    # use encoder, or else the one encoder with as many states as the table
+    # has rows (2048 rows is phase two, 4096 phase three).
+    with open(filename, 'rb') as f:
+        is_binary = f.read(len(MAGIC)) == MAGIC
+    if is_binary:
+        header = read_header(filename)
+        stored = encoder_by_id(header['encoder_id'])
+        if encoder is not None and get_encoder(encoder).id != stored.id:
+            raise ValueError(f"{filename} was trained with encoder {stored.name}, "
+                             f"not {get_encoder(encoder).name}")
+        encoder = stored
+        table = read_table(filename, header['n_states'], header['n_actions'], encoder.id, mmap)
+    else:
+        table = np.loadtxt(filename, ndmin=2)
+        if encoder is not None:
+            encoder = get_encoder(encoder)
+        else:
+            matches = [e for e in ENCODERS.values() if e.n_states == table.shape[0]]
+            if len(matches) != 1:
+                raise ValueError(f"{filename} has {table.shape[0]} states, which does not "
+                                 f"match exactly one state encoder; pass the encoder")
+            encoder = matches[0]
+    if table.shape[0] != encoder.n_states:
+        raise ValueError(f"{filename} has {table.shape[0]} states, but encoder "
+                         f"{encoder.name} has {encoder.n_states}")
+    return table, encoder
@@ -0,0 +1,125 @@
+"""
+Snake Eater pygame renderer
+Draws the game window, redrawing only the cells that changed
+Machine Learning Classes - University Carlos III of Madrid
+
+Episodes and frames that are not shown cost one counter check, so the
+window can stay open while training runs at full speed in between.
+"""
+import sys
+from collections import deque
+from itertools import islice
+
+import pygame
+
+# Colors (R, G, B)
+BLACK = pygame.Color(0, 0, 0)
+RED = pygame.Color(255, 0, 0)
+GREEN = pygame.Color(0, 255, 0)
+
+# Hidden frames between two checks of the window events
+EVENT_INTERVAL = 1024
+
+
+class Renderer:
+    def __init__(self, frame_size_x, frame_size_y, fps=75, every_episodes=1,
+                 every_frames=1, dirty_rects=True):
+        # every_episodes / every_frames: show only every Nth episode and,
+        # inside it, every Nth frame; the frame rate cap applies to shown frames
+        # dirty_rects: redraw only the changed cells instead of the whole window
+        self.fps = fps
+        self.every_episodes = every_episodes
+        self.every_frames = every_frames
+        self.dirty_rects = dirty_rects
+
+        pygame.init()
+        self.window = pygame.display.set_mode((frame_size_x, frame_size_y))
+        self.clock = pygame.time.Clock()
+        self.visible = True
+        self._frame = 0
+        self._hidden = 0
+        self._reset_drawn()
+
+    def begin_episode(self, episode):
+        # episode counts from 0; the window is cleared for shown episodes
+        self.visible = episode % self.every_episodes == 0
+        self._frame = 0
+        if self.visible:
+            self.window.fill(BLACK)
+            # Later frames only update the cells that change, so the cleared
+            # window has to be shown once here
+            pygame.display.flip()
+            self._reset_drawn()
+
+    def _reset_drawn(self):
+        # What the window shows: the body cells as drawn, head first, with
+        # the number of drawn segments on every cell, and the food cell
+        self._drawn = deque()
+        self._count = {}
+        self._food = None
+        # frame number of the last drawn frame; None draws the whole body
+        self._drawn_frame = None
+
+    def frame(self, body, food):
+        # Called after every step that did not end the episode
+        self._frame += 1
+        if not self.visible or self._frame % self.every_frames:
+            self._hidden += 1
+            if self._hidden >= EVENT_INTERVAL:
+                self._hidden = 0
+                self._handle_events()
+            return
+        if self.dirty_rects:
+            self._draw_changes(body, food)
+        else:
+            self._draw_all(body, food)
+        self._handle_events()
+        self.clock.tick(self.fps)
+
+    def _draw_all(self, body, food):
+        window = self.window
+        window.fill(BLACK)
+        for pos in body:
+            pygame.draw.rect(window, GREEN, pygame.Rect(pos[0], pos[1], 10, 10))
+        pygame.draw.rect(window, RED, pygame.Rect(food[0], food[1], 10, 10))
+        pygame.display.flip()
+
+    def _draw_changes(self, body, food):
+        # Every step adds one head and (unless the snake grew) drops one
+        # tail, so only the heads of the steps since the last drawn frame
+        # and the tails the body lost are painted, plus the food: the cost
+        # does not depend on the length of the snake
+        window = self.window
+        drawn, count = self._drawn, self._count
+        if self._drawn_frame is None:
+            steps = len(body)
+        else:
+            steps = min(self._frame - self._drawn_frame, len(body))
+        self._drawn_frame = self._frame
+        rects = []
+        for pos in reversed(list(islice(body, steps))):
+            cell = (pos[0], pos[1])
+            drawn.appendleft(cell)
+            count[cell] = count.get(cell, 0) + 1
+            if count[cell] == 1:
+                rects.append(window.fill(GREEN, (cell[0], cell[1], 10, 10)))
+        while len(drawn) > len(body):
+            cell = drawn.pop()
+            count[cell] -= 1
+            if not count[cell]:
+                del count[cell]
+                rects.append(window.fill(BLACK, (cell[0], cell[1], 10, 10)))
+        food = (food[0], food[1])
+        if self._food is not None and self._food != food:
+            old = self._food
+            rects.append(window.fill(GREEN if old in count else BLACK, (old[0], old[1], 10, 10)))
+        # food is drawn on top of the body, as in a full redraw
+        rects.append(window.fill(RED, (food[0], food[1], 10, 10)))
+        self._food = food
+        pygame.display.update(rects)
+
+    def _handle_events(self):
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                sys.exit()
@@ -0,0 +1,136 @@
+"""
+Snake Eater experience replay
+NumPy ring buffer of transitions and a batched tabular Q-learning update
+Machine Learning Classes - University Carlos III of Madrid
+
+Acting and learning are decoupled: environments push transitions into
+the buffer and the learner applies minibatch updates to the Q-table.
+"""
+import numpy as np
+
+from checkpoint import CheckpointWriter
+from encoders import DEFAULT_ENCODER, get_encoder
+from q_learning import QLearning
+from rng import RandomStream
+from vec_snake_env import VecSnakeEnv
+
+
+class ReplayBuffer:
+    def __init__(self, capacity, rng=None):
+        # rng: numpy Generator used for sampling
+        self.capacity = capacity
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.states = np.zeros(capacity, dtype=np.int64)
+        self.actions = np.zeros(capacity, dtype=np.int64)
+        self.rewards = np.zeros(capacity, dtype=np.float64)
+        self.next_states = np.zeros(capacity, dtype=np.int64)
+        self.dones = np.zeros(capacity, dtype=bool)
+        self.size = 0
+        self.pos = 0
+
+    def add(self, state, action, reward, next_state, done):
+        i = self.pos
+        self.states[i] = state
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.next_states[i] = next_state
+        self.dones[i] = done
+        self.pos = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def add_batch(self, states, actions, rewards, next_states, dones):
+        # Adds one transition per environment, overwriting the oldest ones
+        n = len(states)
+        if n > self.capacity:
+            states, actions, rewards, next_states, dones = (
+                a[-self.capacity:] for a in (states, actions, rewards, next_states, dones))
+            n = self.capacity
+        idx = (self.pos + np.arange(n)) % self.capacity
+        self.states[idx] = states
+        self.actions[idx] = actions
+        self.rewards[idx] = rewards
+        self.next_states[idx] = next_states
+        self.dones[idx] = dones
+        self.pos = (self.pos + n) % self.capacity
+        self.size = min(self.size + n, self.capacity)
+
+    def sample(self, batch_size):
+        idx = self.rng.integers(0, self.size, size=batch_size)
+        return (self.states[idx], self.actions[idx], self.rewards[idx],
+                self.next_states[idx], self.dones[idx])
+
+
+class ReplayLearner:
+    def __init__(self, ql, buffer, batch_size=256):
+        self.ql = ql
+        self.buffer = buffer
+        self.batch_size = batch_size
+
+    def learn(self, n_batches=1):
+        # Applies n_batches minibatch updates. Targets are computed from the
+        # table as it was before the batch; a (state, action) pair that shows
+        # up several times in a batch moves by alpha times its mean TD error,
+        # so duplicates are not applied on top of each other.
+        ql = self.ql
+        if self.buffer.size == 0:
+            return
+        q = ql.q_table.reshape(-1)
+        for _ in range(n_batches):
+            states, actions, rewards, next_states, dones = self.buffer.sample(self.batch_size)
+            # same terminal rule as QLearning.update_q_table
+            terminal = dones | (rewards < 0)
+            max_future_q = np.where(terminal, 0.0, ql.q_table[next_states].max(axis=1))
+            targets = rewards + ql.gamma * max_future_q
+
+            flat = states * ql.n_actions + actions
+            td = targets - q[flat]
+            pairs, inverse = np.unique(flat, return_inverse=True)
+            td_sum = np.bincount(inverse, weights=td, minlength=pairs.size)
+            counts = np.bincount(inverse, minlength=pairs.size)
+            q[pairs] += ql.alpha * td_sum / counts
+
+
+def train_replay(n_envs=64, num_episodes=5000, frame_size_x=300, frame_size_y=300,
+                 growing_body=False, encoder=DEFAULT_ENCODER,
+                 q_table_file="phase three/q_table.bin", log_every=1,
+                 checkpoint_every=1, checkpoint_seconds=None, keep_checkpoints=0,
+                 seed=None, batch_size=256, replay_capacity=100000, updates_per_step=1,
+                 **ql_params):
+    # Trains with n_envs games stepped together by VecSnakeEnv; every step
+    # pushes n_envs transitions into the buffer and runs updates_per_step
+    # minibatch updates.
+    env_rng, ql_rng, buffer_rng = RandomStream(seed).spawn(3)
+    encoder = get_encoder(encoder)
+    ql = QLearning(n_states=encoder.n_states, n_actions=4, filename=q_table_file,
+                   rng=ql_rng, encoder_id=encoder.id, convert_text=True, **ql_params)
+    if not ql.q_table.flags.c_contiguous:
+        ql.q_table = np.ascontiguousarray(ql.q_table)
+    env = VecSnakeEnv(n_envs, frame_size_x, frame_size_y, growing_body, seed=env_rng.seed_seq,
+                      encoder=encoder)
+    buffer = ReplayBuffer(replay_capacity, rng=buffer_rng.generator)
+    learner = ReplayLearner(ql, buffer, batch_size)
+    checkpoints = CheckpointWriter(ql, checkpoint_every, checkpoint_seconds, keep_checkpoints)
+    checkpoints.install_signal_handler()
+
+    states = env.states
+    totals = np.zeros(n_envs)
+    episode = 0
+    while episode < num_episodes:
+        actions = ql.choose_actions(states)
+        next_states, rewards, dones = env.step(actions)
+        buffer.add_batch(states, actions, rewards, next_states, dones)
+        learner.learn(updates_per_step)
+        totals += rewards
+        states = env.states
+
+        for i in np.flatnonzero(dones):
+            episode += 1
+            checkpoints.episode_done(episode)
+            if episode % log_every == 0:
+                print(f"Episode {episode}, Total reward: {totals[i]}")
+            totals[i] = 0.0
+            if episode >= num_episodes:
+                break
+
+    checkpoints.close()
+    return ql
@@ -0,0 +1,58 @@
+"""
+Snake Eater random number streams
+Seeded random numbers drawn from numpy in large blocks
+Machine Learning Classes - University Carlos III of Madrid
+"""
+import numpy as np
+
+
+class RandomStream:
+    def __init__(self, seed=None, block_size=4096):
+        # seed: int, None (fresh entropy) or a numpy SeedSequence
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+        self.seed_seq = seed
+        self.generator = np.random.Generator(np.random.PCG64(seed))
+        self.block_size = block_size
+        self._block = []
+        self._pos = 0
+        # Generator state the current block was drawn from, for tell()
+        self._block_state = self.generator.bit_generator.state
+
+    def random(self):
+        # Uniform float in [0, 1); numbers come from a pre-drawn block
+        # kept as a Python list so handing one out is a plain index
+        if self._pos == len(self._block):
+            self._block_state = self.generator.bit_generator.state
+            self._block = self.generator.random(self.block_size).tolist()
+            self._pos = 0
+        u = self._block[self._pos]
+        self._pos += 1
+        return u
+
+    def randrange(self, low, high):
+        # Integer in [low, high), like random.randrange(low, high)
+        return low + int(self.random() * (high - low))
+
+    def choice(self, seq):
+        return seq[int(self.random() * len(seq))]
+
+    def tell(self):
+        # Current position as (PCG64 state, PCG64 increment, index in the
+        # block); seek() returns to it. Only numbers handed out by random(),
+        # randrange() and choice() are covered, not direct generator draws.
+        state = self._block_state['state']
+        return state['state'], state['inc'], self._pos
+
+    def seek(self, position):
+        state, inc, pos = position
+        bit_generator = self.generator.bit_generator
+        bit_generator.state = {'bit_generator': 'PCG64', 'state': {'state': state, 'inc': inc},
+                               'has_uint32': 0, 'uinteger': 0}
+        self._block_state = bit_generator.state
+        self._block = self.generator.random(self.block_size).tolist()
+        self._pos = pos
+
+    def spawn(self, n):
+        # n independent child streams, e.g. one per environment or worker
+        return [RandomStream(child, self.block_size) for child in self.seed_seq.spawn(n)]
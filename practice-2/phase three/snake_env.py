@@ -5,21 +5,40 @@ Last modification in April 2024 by José Luis Perán
 Machine Learning Classes - University Carlos III of Madrid
 """
 import numpy as np
-import random
+from collections import deque
+
+from encoders import DEFAULT_ENCODER, get_encoder
+from rng import RandomStream
+
+DIR_DELTA = {'UP': (0, -10), 'DOWN': (0, 10),
+             'LEFT': (-10, 0), 'RIGHT': (10, 0)}
 
 class SnakeGameEnv:
-    def __init__(self, frame_size_x=150, frame_size_y=150, growing_body=True):
+    def __init__(self, frame_size_x=150, frame_size_y=150, growing_body=True, rng=None,
+                 encoder=DEFAULT_ENCODER):
         # Initializes the environment with default values
+        # rng: RandomStream used for food spawning (a fresh one by default)
+        # encoder: name of a registered state encoder (see encoders.py)
+        self.rng = rng if rng is not None else RandomStream()
+        self.encoder = get_encoder(encoder)
+        self.n_states = self.encoder.n_states
         self.frame_size_x = frame_size_x
         self.frame_size_y = frame_size_y
         self.growing_body = growing_body
+        self.cells_x = frame_size_x // 10
+        self.cells_y = frame_size_y // 10
         self.reset()
 
     def reset(self):
         # Resets the environment with default values
         self.snake_pos = [50, 50]
-        self.snake_body = [[50, 50], [60, 50], [70, 50]]
-        self.food_pos = [random.randrange(1, (self.frame_size_x // 10)) * 10, random.randrange(1, (self.frame_size_y // 10)) * 10]
+        self.snake_body = deque([[50, 50], [60, 50], [70, 50]])
+        # Number of body segments on every cell of the board, kept in sync
+        # with snake_body so collision checks don't scan the body
+        self.occupancy = bytearray(self.cells_x * self.cells_y)
+        for block in self.snake_body:
+            self.occupancy[self._cell(block[0], block[1])] += 1
+        self.food_pos = [self.rng.randrange(1, (self.frame_size_x // 10)) * 10, self.rng.randrange(1, (self.frame_size_y // 10)) * 10]
         self._prev_dist = abs(self.snake_pos[0] - self.food_pos[0]) \
                         + abs(self.snake_pos[1] - self.food_pos[1])
         self.food_spawn = True
@@ -34,87 +53,62 @@ class SnakeGameEnv:
         # Check for collision with food, walls, or self
         # Update the score and reset food as necessary
         # Determine if the game is over
+        # The collision result and the three neighbour cells are computed
+        # once and shared by the reward and the state encoding.
         self.update_snake_position(action)
-        reward = self.calculate_reward()
-        self.update_food_position()
-        state = self.get_state()
         self.game_over = self.check_game_over()
+        neighbours = self._neighbour_cells()
+        reward = self._reward(self.game_over, neighbours)
+        self.update_food_position()
+        state = self._encode(neighbours)
         return state, reward, self.game_over
 
     def get_state(self):
         """
-        Compute a 7-bit integer state:
-          bit 6 = danger_straight
-          bit 5 = danger_right
-          bit 4 = danger_left
-          bit 3 = food_left
-          bit 2 = food_right
-          bit 1 = food_up
-          bit 0 = food_down
+        Compute the integer state with the environment's encoder. For the
+        default phase three encoder it has 12 bits:
+          bit 11 = danger_straight
+          bit 10 = danger_right
+          bit 9  = danger_left
+          bit 8  = body_collision
+          bit 7  = food_left
+          bit 6  = food_right
+          bit 5  = food_up
+          bit 4  = food_down
+          bits 3-2 = direction code (UP=0, RIGHT=1, DOWN=2, LEFT=3)
+          bits 1-0 = distance-to-food bucket
         """
+        return self._encode(self._neighbour_cells())
+
+    def _neighbour_cells(self):
+        # Board cells of the three “will I crash?” points
+        # (straight, right, left); -1 when the point is outside the board
         head_x, head_y = self.snake_pos
-        dir_map = {'UP': (0, -10), 'DOWN': (0, 10),
-                   'LEFT': (-10, 0), 'RIGHT': (10, 0)}
-        dx, dy = dir_map[self.direction]
-
-        # compute the three “will I crash?” points
-        point_s = [head_x + dx, head_y + dy]
-        point_l = [head_x - dy, head_y + dx]
-        point_r = [head_x + dy, head_y - dx]
-
-        danger_straight = int(
-            point_s[0] < 0 or point_s[0] > self.frame_size_x-10 or
-            point_s[1] < 0 or point_s[1] > self.frame_size_y-10 or
-            point_s in self.snake_body
-        )
-        danger_right = int(
-            point_r[0] < 0 or point_r[0] > self.frame_size_x-10 or
-            point_r[1] < 0 or point_r[1] > self.frame_size_y-10 or
-            point_r in self.snake_body
-        )
-        danger_left = int(
-            point_l[0] < 0 or point_l[0] > self.frame_size_x-10 or
-            point_l[1] < 0 or point_l[1] > self.frame_size_y-10 or
-            point_l in self.snake_body
-        )
-
-        food_left  = int(self.food_pos[0] < head_x)
-        food_right = int(self.food_pos[0] > head_x)
-        food_up    = int(self.food_pos[1] < head_y)
-        food_down  = int(self.food_pos[1] > head_y)
-
-        body_collision = int(point_s in self.snake_body[1:])
-
-        bits = [
-            danger_straight, danger_right, danger_left, body_collision,
-            food_left, food_right, food_up, food_down
-        ]
-
-        dir_encoding = {'UP':0, 'RIGHT':1, 'DOWN':2, 'LEFT':3}
-        direction_code = dir_encoding[self.direction]    # 2 bits
-
-        # bucket distance into 4 roughly even ranges
-        head_x, head_y = self.snake_pos
-        fx, fy       = self.food_pos
-        cell_dist    = (abs(head_x - fx) + abs(head_y - fy)) // 10  # 0–28 cells
-        if   cell_dist <= 3:  dist_bucket = 0
-        elif cell_dist <= 8:  dist_bucket = 1
-        elif cell_dist <= 15: dist_bucket = 2
-        else:                 dist_bucket = 3
-        # also 2 bits
-
-        # now put them on the bit‐list:
-        # direction_code  -> 2 bits
-        # dist_bucket     -> 2 bits
-        for b in [(direction_code >> 1)&1, direction_code&1,
-                (dist_bucket   >> 1)&1, dist_bucket&1]:
-            bits.append(b)
-
-        # finally pack all bits into a single integer:
-        state = 0
-        for b in bits:
-            state = (state << 1) | b
-        return state
+        dx, dy = DIR_DELTA[self.direction]
+        return (self._cell(head_x + dx, head_y + dy),
+                self._cell(head_x + dy, head_y - dx),
+                self._cell(head_x - dy, head_y + dx))
+
+    def _encode(self, neighbours):
+        return self.encoder.encode(self, neighbours)
+
+    def snapshot(self):
+        # Copy of the whole game, including the food random stream;
+        # restore() puts the environment back to it
+        return (list(self.snake_pos), deque(self.snake_body), bytearray(self.occupancy),
+                list(self.food_pos), self._prev_dist, self.food_spawn, self.direction,
+                self.score, self.game_over, self.rng.tell())
+
+    def restore(self, snapshot):
+        # Body segments and food positions are never changed in place,
+        # so the copies can be shared
+        (snake_pos, snake_body, occupancy, food_pos, self._prev_dist, self.food_spawn,
+         self.direction, self.score, self.game_over, rng_position) = snapshot
+        self.snake_pos = list(snake_pos)
+        self.snake_body = deque(snake_body)
+        self.occupancy = bytearray(occupancy)
+        self.food_pos = list(food_pos)
+        self.rng.seek(rng_position)
 
     def get_body(self):
         return self.snake_body
@@ -123,12 +117,15 @@ class SnakeGameEnv:
         return self.food_pos
 
     def calculate_reward(self):
+        return self._reward(self.check_game_over(), self._neighbour_cells())
+
+    def _reward(self, game_over, neighbours):
         # 10 for eating
         if not self.food_spawn:
             return 10.0
 
         # -30 for crashing
-        if self.check_game_over():
+        if game_over:
             return -30.0
 
         # distance to food and wall danger
@@ -136,44 +133,44 @@ class SnakeGameEnv:
         fx, fy = self.food_pos
         curr_dist = abs(head_x - fx) + abs(head_y - fy)
 
-        # initialize on first call after reset
-        if not hasattr(self, '_prev_dist'):
-            self._prev_dist = curr_dist
-
         delta = self._prev_dist - curr_dist
         self._prev_dist = curr_dist
 
         # basic distance reward: +1 if closer, –1 if farther
         reward = 1.0 if delta > 0 else (-1.0 if delta < 0 else 0.0)
 
-        # danger penalty: check one step ahead in all three relative directions
-        dir_map = {'UP': (0, -10), 'DOWN': (0, 10),
-                   'LEFT': (-10, 0), 'RIGHT': (10, 0)}
-        dx, dy = dir_map[self.direction]
-        # straight, right, left
-        points = [
-            (head_x + dx, head_y + dy),
-            (head_x + dy, head_y - dx),
-            (head_x - dy, head_y + dx)
-        ]
-        for px, py in points:
-            if (px < 0 or px > self.frame_size_x-10 or
-                py < 0 or py > self.frame_size_y-10):
+        # danger penalty: one step ahead in all three relative directions
+        for cell in neighbours:
+            if cell < 0:
                 reward -= 1.0   # penalty for “would hit wall” in that direction
 
         return reward
 
     def check_game_over(self):
         # Return True if the game is over, else False
-        if self.snake_pos[0] < 0 or self.snake_pos[0] > self.frame_size_x-10:
+        cell = self._cell(self.snake_pos[0], self.snake_pos[1])
+        if cell < 0:
             return True
-        if self.snake_pos[1] < 0 or self.snake_pos[1] > self.frame_size_y-10:
-            return True
-        for block in self.snake_body[1:]:
-            if self.snake_pos[0] == block[0] and self.snake_pos[1] == block[1]:
-                return True
-
-        return False
+        # the head itself is one of the segments on its cell
+        return self.occupancy[cell] > 1
+
+    def _cell(self, x, y):
+        # Index of the board cell at pixel position (x, y), or -1 if outside
+        if x < 0 or x > self.frame_size_x-10 or y < 0 or y > self.frame_size_y-10:
+            return -1
+        return (x // 10) * self.cells_y + y // 10
+
+    def _push_head(self):
+        self.snake_body.appendleft(list(self.snake_pos))
+        cell = self._cell(self.snake_pos[0], self.snake_pos[1])
+        if cell >= 0:
+            self.occupancy[cell] += 1
+
+    def _pop_tail(self):
+        block = self.snake_body.pop()
+        cell = self._cell(block[0], block[1])
+        if cell >= 0:
+            self.occupancy[cell] -= 1
 
     def update_snake_position(self, action):
         # Updates the snake's position based on the action
@@ -211,18 +208,18 @@ class SnakeGameEnv:
         self.direction = direction
 
 
-        self.snake_body.insert(0, list(self.snake_pos))
+        self._push_head()
 
         if self.snake_pos[0] == self.food_pos[0] and self.snake_pos[1] == self.food_pos[1]:
             self.score += 10
             self.food_spawn = False
             # If the snake is not growing
             if not self.growing_body:
-                self.snake_body.pop()
+                self._pop_tail()
         else:
-            self.snake_body.pop()
+            self._pop_tail()
 
     def update_food_position(self):
         if not self.food_spawn:
-            self.food_pos = [random.randrange(1, (self.frame_size_x//10)) * 10, random.randrange(1, (self.frame_size_x//10)) * 10]
+            self.food_pos = [self.rng.randrange(1, (self.frame_size_x//10)) * 10, self.rng.randrange(1, (self.frame_size_x//10)) * 10]
         self.food_spawn = True
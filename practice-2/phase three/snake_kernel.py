@@ -0,0 +1,435 @@
+"""
+Snake Eater compiled episode kernel
+Whole training episodes in one compiled loop when Numba is installed
+Machine Learning Classes - University Carlos III of Madrid
+
+The kernel reproduces SnakeGameEnv.step and QLearning.choose_action /
+update_q_table with integer direction codes and array state. When Numba
+is not installed, run_episode falls back to the SnakeGameEnv/QLearning
+code. Both paths read their random numbers from the same UniformBlocks
+streams, so a given seed gives the same trajectory on either path:
+
+    python "phase three/snake_kernel.py" --check
+"""
+import argparse
+import sys
+
+import numpy as np
+
+from checkpoint import CheckpointWriter
+from encoders import get_encoder
+from q_learning import QLearning
+from snake_env import SnakeGameEnv
+
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+    def njit(*args, **kwargs):
+        # Without Numba the kernel stays a plain Python function
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda fn: fn
+
+ALLOWED_ACTIONS = [0, 1, 2, 3]
+
+
+@njit(cache=True)
+def _encode(head_x, head_y, direction, food_x, food_y, occupancy, cells_x, cells_y):
+    # Same 12-bit layout as SnakeGameEnv.get_state
+    # direction uses action codes: 0=UP, 1=DOWN, 2=LEFT, 3=RIGHT
+    dx = (0, 0, -1, 1)[direction]
+    dy = (-1, 1, 0, 0)[direction]
+    state = 0
+    # straight, right, left
+    for k in range(3):
+        if k == 0:
+            px, py = head_x + dx, head_y + dy
+        elif k == 1:
+            px, py = head_x + dy, head_y - dx
+        else:
+            px, py = head_x - dy, head_y + dx
+        inside = 0 <= px < cells_x and 0 <= py < cells_y
+        body = inside and occupancy[px, py] > 0
+        if not inside or body:
+            state |= 1 << (11 - k)
+        if k == 0 and body:
+            state |= 1 << 8
+    if food_x < head_x:
+        state |= 1 << 7
+    if food_x > head_x:
+        state |= 1 << 6
+    if food_y < head_y:
+        state |= 1 << 5
+    if food_y > head_y:
+        state |= 1 << 4
+    state |= (0, 2, 3, 1)[direction] << 2
+    cell_dist = abs(head_x - food_x) + abs(head_y - food_y)
+    if cell_dist <= 3:
+        bucket = 0
+    elif cell_dist <= 8:
+        bucket = 1
+    elif cell_dist <= 15:
+        bucket = 2
+    else:
+        bucket = 3
+    return state | bucket
+
+
+# Slots of the int64 array that carries a game between kernel calls
+START, LENGTH, HEAD_X, HEAD_Y, DIRECTION, FOOD_X, FOOD_Y, PREV_DIST, SCORE, STATE, STEPS, \
+    GAME_OVER = range(12)
+N_SLOTS = 12
+
+
+@njit(cache=True)
+def _reset_kernel(cells_x, cells_y, env_u, env_i, body_x, body_y, occupancy, game):
+    # SnakeGameEnv.reset; uses two environment uniforms, returns env_i
+    occupancy[:, :] = 0
+    for k in range(3):
+        body_x[k] = 5 + k
+        body_y[k] = 5
+        occupancy[5 + k, 5] += 1
+    food_x = 1 + int(env_u[env_i] * (cells_x - 1))
+    food_y = 1 + int(env_u[env_i + 1] * (cells_y - 1))
+    game[START] = 0
+    game[LENGTH] = 3
+    game[HEAD_X] = 5
+    game[HEAD_Y] = 5
+    game[DIRECTION] = 3
+    game[FOOD_X] = food_x
+    game[FOOD_Y] = food_y
+    game[PREV_DIST] = abs(5 - food_x) + abs(5 - food_y)
+    game[SCORE] = 0
+    game[STATE] = _encode(5, 5, 3, food_x, food_y, occupancy, cells_x, cells_y)
+    game[STEPS] = 0
+    game[GAME_OVER] = 0
+    return env_i + 2
+
+
+@njit(cache=True)
+def _episode_kernel(q_table, cells_x, cells_y, growing_body, env_u, env_i, ql_u, ql_i,
+                    epsilon, epsilon_min, epsilon_decay, alpha, gamma, training,
+                    max_steps, body_x, body_y, occupancy, game,
+                    out_states, out_actions, out_rewards):
+    # Runs the game in `game` until it ends, reaches max_steps or a step
+    # could run out of uniforms (the caller then refills env_u / ql_u and
+    # calls again). Returns (env_i, ql_i, epsilon).
+    n_actions = q_table.shape[1]
+    capacity = body_x.shape[0]
+    start = game[START]
+    length = game[LENGTH]
+    head_x = game[HEAD_X]
+    head_y = game[HEAD_Y]
+    direction = game[DIRECTION]
+    food_x = game[FOOD_X]
+    food_y = game[FOOD_Y]
+    prev_dist = game[PREV_DIST]
+    score = game[SCORE]
+    state = game[STATE]
+    steps = game[STEPS]
+    game_over = False
+
+    # a step uses at most two uniforms of each stream
+    while steps < max_steps and env_i + 2 <= env_u.shape[0] and ql_i + 2 <= ql_u.shape[0]:
+        # choose_action
+        if ql_u[ql_i] < epsilon:
+            action = int(ql_u[ql_i + 1] * 4)
+            ql_i += 2
+        else:
+            ql_i += 1
+            action = 0
+            best = q_table[state, 0]
+            for a in range(1, n_actions):
+                if q_table[state, a] > best:
+                    best = q_table[state, a]
+                    action = a
+        epsilon = max(epsilon_min, epsilon_decay * epsilon)
+
+        # update_snake_position
+        if action != (direction ^ 1):
+            direction = action
+        head_x += (0, 0, -1, 1)[direction]
+        head_y += (-1, 1, 0, 0)[direction]
+        inside = 0 <= head_x < cells_x and 0 <= head_y < cells_y
+        start = (start - 1) % capacity
+        body_x[start] = head_x
+        body_y[start] = head_y
+        length += 1
+        if inside:
+            occupancy[head_x, head_y] += 1
+        ate = head_x == food_x and head_y == food_y
+        if ate:
+            score += 10
+        if not ate or not growing_body:
+            tail = (start + length - 1) % capacity
+            tx, ty = body_x[tail], body_y[tail]
+            if 0 <= tx < cells_x and 0 <= ty < cells_y:
+                occupancy[tx, ty] -= 1
+            length -= 1
+
+        # check_game_over
+        game_over = not inside or occupancy[head_x, head_y] > 1
+
+        # calculate_reward
+        if ate:
+            reward = 10.0
+        elif game_over:
+            reward = -30.0
+        else:
+            curr_dist = abs(head_x - food_x) + abs(head_y - food_y)
+            delta = prev_dist - curr_dist
+            prev_dist = curr_dist
+            reward = 1.0 if delta > 0 else (-1.0 if delta < 0 else 0.0)
+            dx = (0, 0, -1, 1)[direction]
+            dy = (-1, 1, 0, 0)[direction]
+            for k in range(3):
+                if k == 0:
+                    px, py = head_x + dx, head_y + dy
+                elif k == 1:
+                    px, py = head_x + dy, head_y - dx
+                else:
+                    px, py = head_x - dy, head_y + dx
+                if not (0 <= px < cells_x and 0 <= py < cells_y):
+                    reward -= 1.0
+
+        # update_food_position (SnakeGameEnv uses the x size for both axes)
+        if ate:
+            food_x = 1 + int(env_u[env_i] * (cells_x - 1))
+            food_y = 1 + int(env_u[env_i + 1] * (cells_x - 1))
+            env_i += 2
+
+        next_state = _encode(head_x, head_y, direction, food_x, food_y, occupancy, cells_x, cells_y)
+
+        # update_q_table, in double precision like QLearning
+        if training:
+            current_q = float(q_table[state, action])
+            if reward < 0:
+                max_future_q = 0.0
+            else:
+                max_future_q = float(q_table[next_state, 0])
+                for a in range(1, n_actions):
+                    if q_table[next_state, a] > max_future_q:
+                        max_future_q = float(q_table[next_state, a])
+            q_table[state, action] = (
+                (1 - alpha) * current_q +
+                alpha * (reward + gamma * max_future_q)
+            )
+
+        out_states[steps] = state
+        out_actions[steps] = action
+        out_rewards[steps] = reward
+        steps += 1
+        state = next_state
+        if game_over:
+            break
+
+    game[START] = start
+    game[LENGTH] = length
+    game[HEAD_X] = head_x
+    game[HEAD_Y] = head_y
+    game[DIRECTION] = direction
+    game[FOOD_X] = food_x
+    game[FOOD_Y] = food_y
+    game[PREV_DIST] = prev_dist
+    game[SCORE] = score
+    game[STATE] = state
+    game[STEPS] = steps
+    game[GAME_OVER] = game_over
+    return env_i, ql_i, epsilon
+
+
+class UniformBlocks:
+    # Uniform numbers drawn from a numpy Generator block_size at a time
+    # into an array the kernel reads from `pos` on. random()/choice()/
+    # randrange() hand out the same sequence one by one, so SnakeGameEnv
+    # and QLearning can use it as their RandomStream.
+    def __init__(self, seed=None, block_size=4096):
+        # seed: int, None (fresh entropy) or a numpy SeedSequence
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+        self.generator = np.random.Generator(np.random.PCG64(seed))
+        self.block_size = block_size
+        self.values = np.empty(0)
+        self.pos = 0
+
+    def refill(self, n=2):
+        # Makes sure at least n numbers are left; unread ones are kept in
+        # front, so the sequence is the same whatever the block size
+        if self.values.shape[0] - self.pos < n:
+            self.values = np.concatenate([self.values[self.pos:],
+                                          self.generator.random(max(n, self.block_size))])
+            self.pos = 0
+
+    def random(self):
+        self.refill(1)
+        u = self.values[self.pos]
+        self.pos += 1
+        return float(u)
+
+    def randrange(self, low, high):
+        return low + int(self.random() * (high - low))
+
+    def choice(self, seq):
+        return seq[int(self.random() * len(seq))]
+
+
+class EpisodeBuffers:
+    # Game and trajectory arrays for the kernel, allocated once per run
+    def __init__(self, frame_size_x, frame_size_y, max_steps):
+        cells_x, cells_y = frame_size_x // 10, frame_size_y // 10
+        capacity = cells_x * cells_y + 2
+        self.body_x = np.empty(capacity, dtype=np.int64)
+        self.body_y = np.empty(capacity, dtype=np.int64)
+        self.occupancy = np.zeros((cells_x, cells_y), dtype=np.uint8)
+        self.game = np.zeros(N_SLOTS, dtype=np.int64)
+        self.states = np.empty(max_steps, dtype=np.int64)
+        self.actions = np.empty(max_steps, dtype=np.int64)
+        self.rewards = np.empty(max_steps, dtype=np.float64)
+
+
+def run_episode(q_table, env_rng, ql_rng, frame_size_x=300, frame_size_y=300,
+                growing_body=False, epsilon=0.7, epsilon_min=0.01, epsilon_decay=0.995,
+                alpha=0.1, gamma=0.99, training=True, max_steps=10000, compiled=None,
+                buffers=None):
+    # Plays one episode, updating q_table in place when training.
+    # env_rng / ql_rng: UniformBlocks for food and exploration; both paths
+    # read the same numbers from them.
+    # compiled: force the kernel (True) or the Python code (False); by
+    # default the kernel is used when Numba is installed.
+    # buffers: EpisodeBuffers to reuse (the returned arrays are views into
+    # them, valid until the next episode)
+    # Returns (states, actions, rewards, epsilon, score)
+    if compiled is None:
+        compiled = HAVE_NUMBA
+    if not compiled:
+        return _run_python(q_table, env_rng, ql_rng, frame_size_x, frame_size_y, growing_body,
+                           epsilon, epsilon_min, epsilon_decay, alpha, gamma, training, max_steps)
+    if buffers is None:
+        buffers = EpisodeBuffers(frame_size_x, frame_size_y, max_steps)
+    b = buffers
+    cells_x, cells_y = frame_size_x // 10, frame_size_y // 10
+    env_rng.refill()
+    env_rng.pos = _reset_kernel(cells_x, cells_y, env_rng.values, env_rng.pos,
+                                b.body_x, b.body_y, b.occupancy, b.game)
+    while True:
+        env_rng.refill()
+        ql_rng.refill()
+        env_rng.pos, ql_rng.pos, epsilon = _episode_kernel(
+            q_table, cells_x, cells_y, growing_body, env_rng.values, env_rng.pos,
+            ql_rng.values, ql_rng.pos, epsilon, epsilon_min, epsilon_decay, alpha, gamma,
+            training, max_steps, b.body_x, b.body_y, b.occupancy, b.game,
+            b.states, b.actions, b.rewards)
+        if b.game[GAME_OVER] or b.game[STEPS] >= max_steps:
+            break
+    steps = b.game[STEPS]
+    return b.states[:steps], b.actions[:steps], b.rewards[:steps], epsilon, int(b.game[SCORE])
+
+
+def _run_python(q_table, env_rng, ql_rng, frame_size_x, frame_size_y, growing_body,
+                epsilon, epsilon_min, epsilon_decay, alpha, gamma, training, max_steps):
+    env = SnakeGameEnv(frame_size_x, frame_size_y, growing_body, rng=env_rng)
+    ql = QLearning(q_table.shape[0], q_table.shape[1], alpha=alpha, gamma=gamma,
+                   epsilon=epsilon, epsilon_min=epsilon_min, epsilon_decay=epsilon_decay,
+                   q_table=q_table, rng=ql_rng)
+    states, actions, rewards = [], [], []
+    # the constructor already reset the game
+    state = env.get_state()
+    game_over = False
+    while not game_over and len(states) < max_steps:
+        action = ql.choose_action(state, ALLOWED_ACTIONS)
+        next_state, reward, game_over = env.step(action)
+        if training:
+            ql.update_q_table(state, action, reward, next_state)
+        states.append(state)
+        actions.append(action)
+        rewards.append(reward)
+        state = next_state
+    return (np.array(states, dtype=np.int64), np.array(actions, dtype=np.int64),
+            np.array(rewards, dtype=np.float64), ql.epsilon, env.score)
+
+
+def train_jit(num_episodes=5000, frame_size_x=300, frame_size_y=300, growing_body=False,
+              q_table_file="phase three/q_table.bin", log_every=1,
+              checkpoint_every=1, checkpoint_seconds=None, keep_checkpoints=0,
+              seed=None, max_steps=100000, **ql_params):
+    # Training loop of SnakeGame.run with every episode run by run_episode
+    # The kernel always uses the phase three state encoding
+    encoder = get_encoder('phase_three')
+    ql = QLearning(n_states=encoder.n_states, n_actions=4, filename=q_table_file,
+                   encoder_id=encoder.id, convert_text=True, **ql_params)
+    # Numba has no float16 arithmetic, so half-precision tables run as float32
+    dtype = np.float32 if ql.q_table.dtype == np.float16 else ql.q_table.dtype
+    ql.q_table = np.ascontiguousarray(ql.q_table, dtype=dtype)
+    checkpoints = CheckpointWriter(ql, checkpoint_every, checkpoint_seconds, keep_checkpoints)
+    checkpoints.install_signal_handler()
+    # One food stream and one exploration stream for the whole run, as in
+    # SnakeGame.run
+    env_rng, ql_rng = (UniformBlocks(s) for s in np.random.SeedSequence(seed).spawn(2))
+    buffers = EpisodeBuffers(frame_size_x, frame_size_y, max_steps)
+
+    for episode in range(num_episodes):
+        states, actions, rewards, ql.epsilon, score = run_episode(
+            ql.q_table, env_rng, ql_rng, frame_size_x, frame_size_y, growing_body,
+            ql.epsilon, ql.epsilon_min, ql.epsilon_decay, ql.alpha, ql.gamma,
+            training=True, max_steps=max_steps, buffers=buffers)
+        checkpoints.episode_done(episode + 1)
+        if (episode + 1) % log_every == 0:
+            print(f"Episode {episode+1}, Total reward: {rewards.sum()}")
+
+    checkpoints.close()
+    return ql
+
+
+def check(n_episodes=200, seed=0, frame_size_x=150, frame_size_y=150, growing_body=False,
+          dtype=np.float64, max_steps=2000, block_size=64):
+    # Differential check: the kernel and the Python code must produce the
+    # same trajectories and the same Q-table from the same seed. A small
+    # block_size makes the kernel stop and resume for refills often.
+    # Without Numba the kernel runs interpreted, which still checks its logic.
+    q_kernel = np.zeros((4096, 4), dtype=dtype)
+    q_python = np.zeros((4096, 4), dtype=dtype)
+    eps_kernel = eps_python = 0.7
+    kernel_rngs = [UniformBlocks(s, block_size) for s in np.random.SeedSequence(seed).spawn(2)]
+    python_rngs = [UniformBlocks(s) for s in np.random.SeedSequence(seed).spawn(2)]
+    buffers = EpisodeBuffers(frame_size_x, frame_size_y, max_steps)
+    args = (frame_size_x, frame_size_y, growing_body)
+    for episode in range(n_episodes):
+        k = run_episode(q_kernel, *kernel_rngs, *args, eps_kernel, 0.01, 0.995, 0.1, 0.99,
+                        True, max_steps, compiled=True, buffers=buffers)
+        p = run_episode(q_python, *python_rngs, *args, eps_python, 0.01, 0.995, 0.1, 0.99,
+                        True, max_steps, compiled=False)
+        for name, a, b in zip(('states', 'actions', 'rewards'), k[:3], p[:3]):
+            if not np.array_equal(a, b):
+                raise AssertionError(f"episode {episode} (growing={growing_body}): {name} differ")
+        if k[3:] != p[3:]:
+            raise AssertionError(f"episode {episode} (growing={growing_body}): epsilon/score differ")
+        eps_kernel, eps_python = k[3], p[3]
+    if not np.array_equal(q_kernel, q_python):
+        raise AssertionError(f"Q-tables differ (growing={growing_body})")
+    return n_episodes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compiled snake episode kernel.")
+    parser.add_argument('--check', action='store_true',
+                        help="check that the kernel and the Python code give identical trajectories")
+    parser.add_argument('--episodes', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    if args.check:
+        backend = "compiled" if HAVE_NUMBA else "interpreted (Numba not installed)"
+        for growing_body in (False, True):
+            for dtype in (np.float64, np.float32):
+                check(args.episodes, args.seed, growing_body=growing_body, dtype=dtype)
+        print(f"kernel ({backend}) matches SnakeGameEnv/QLearning on {args.episodes} episodes "
+              f"x 2 body modes x float64/float32")
+        return 0
+    parser.print_help()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
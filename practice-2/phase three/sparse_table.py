@@ -0,0 +1,88 @@
+"""
+Snake Eater sparse Q-table
+Q-table that only stores the rows of states that have been updated
+Machine Learning Classes - University Carlos III of Madrid
+
+Rows live in one growing array and a dict maps each stored state to its
+row, so memory grows with the number of visited states instead of the
+size of the encoding. States that were never updated read as all zeros.
+"""
+import numpy as np
+
+
+class SparseQTable:
+    def __init__(self, n_states, n_actions, dtype=np.float64, capacity=1024):
+        self.shape = (n_states, n_actions)
+        self.dtype = np.dtype(dtype)
+        self.index = {}
+        self.rows = np.zeros((capacity, n_actions), dtype=self.dtype)
+        self._zeros = np.zeros(n_actions, dtype=self.dtype)
+        self._zeros.flags.writeable = False
+
+    def __len__(self):
+        # Number of stored states
+        return len(self.index)
+
+    def __getitem__(self, key):
+        # q[state] -> row (read-only zeros for an unseen state), q[state, action] -> value
+        if isinstance(key, tuple):
+            state, action = key
+            i = self.index.get(state)
+            return self.rows[i, action] if i is not None else self._zeros[action]
+        i = self.index.get(key)
+        return self.rows[i] if i is not None else self._zeros
+
+    def __setitem__(self, key, value):
+        # q[state, action] = value stores the state if it is new
+        state, action = key
+        i = self.index.get(state)
+        if i is None:
+            i = self._add(state)
+        self.rows[i, action] = value
+
+    def _add(self, state):
+        if not 0 <= state < self.shape[0]:
+            raise IndexError(f"state {state} is outside the table (0..{self.shape[0] - 1})")
+        i = len(self.index)
+        if i == len(self.rows):
+            rows = np.zeros((2 * len(self.rows), self.shape[1]), dtype=self.dtype)
+            rows[:i] = self.rows
+            self.rows = rows
+        self.index[state] = i
+        return i
+
+    @property
+    def nbytes(self):
+        return self.rows.nbytes
+
+    def states(self):
+        # Stored states in increasing order and their rows
+        stored = sorted(self.index.items())
+        states = np.array([state for state, _ in stored], dtype=np.int64)
+        rows = self.rows[np.array([i for _, i in stored], dtype=np.int64)]
+        return states, rows
+
+    def copy(self):
+        table = SparseQTable(*self.shape, dtype=self.dtype, capacity=max(1, len(self.index)))
+        table.index = dict(self.index)
+        table.rows = self.rows[:max(1, len(self.index))].copy()
+        return table
+
+    def to_dense(self):
+        dense = np.zeros(self.shape, dtype=self.dtype)
+        states, rows = self.states()
+        dense[states] = rows
+        return dense
+
+    @classmethod
+    def from_rows(cls, n_states, states, rows):
+        table = cls(n_states, rows.shape[1], dtype=rows.dtype, capacity=max(1, len(states)))
+        table.rows[:len(states)] = rows
+        table.index = dict(zip(np.asarray(states).tolist(), range(len(states))))
+        return table
+
+    @classmethod
+    def from_dense(cls, dense):
+        # Keeps only the rows that are not all zeros
+        states = np.flatnonzero(np.any(dense != 0, axis=1))
+        return cls.from_rows(dense.shape[0], states, np.asarray(dense[states]))
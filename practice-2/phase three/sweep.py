@@ -0,0 +1,260 @@
+"""
+Snake Eater hyperparameter sweep
+Trains many configurations in a process pool and drops the losing ones early
+Machine Learning Classes - University Carlos III of Madrid
+
+Usage (from the practice-2 folder):
+    python "phase three/sweep.py" --param alpha=0.05,0.1,0.2 --param gamma=0.9,0.99 --episodes 2000
+    python "phase three/sweep.py" --random 24 --param alpha=0.01:0.5:log --param epsilon_decay=0.99:0.9999
+
+Trials are trained in rounds (successive halving). After every round each
+surviving trial plays the same greedy evaluation episodes, and only the
+best 1/eta of them are trained further. Every trial keeps its own Q-table
+in memory; nothing is written next to the real q_table.bin.
+"""
+import argparse
+import itertools
+import json
+import math
+import multiprocessing as mp
+import os
+
+import numpy as np
+
+from cli import parse_board
+from encoders import DEFAULT_ENCODER, get_encoder
+from evaluate import greedy_actions, play_episode
+from q_learning import QLearning
+from rng import RandomStream
+from snake_env import SnakeGameEnv
+
+# Tunable parameters, how to read their values and their defaults
+QL_PARAMS = ('alpha', 'gamma', 'epsilon', 'epsilon_min', 'epsilon_decay')
+PARAMS = {
+    'alpha': float,
+    'gamma': float,
+    'epsilon': float,
+    'epsilon_min': float,
+    'epsilon_decay': float,
+    'growing': lambda v: v.lower() in ('1', 'true', 'yes', 'on'),
+    'board': str,
+    'encoder': str,
+}
+DEFAULTS = {'alpha': 0.1, 'gamma': 0.99, 'epsilon': 0.7, 'epsilon_min': 0.01,
+            'epsilon_decay': 0.995, 'growing': False, 'board': '30x30',
+            'encoder': DEFAULT_ENCODER}
+
+
+def parse_param(text):
+    # "alpha=0.05,0.1" -> ('alpha', [0.05, 0.1]); "alpha=0.01:0.5:log" ->
+    # ('alpha', (0.01, 0.5, True)), a range for random search
+    name, _, values = text.partition('=')
+    if name not in PARAMS or not values:
+        raise argparse.ArgumentTypeError(
+            f"expected NAME=VALUES with NAME one of {', '.join(PARAMS)}, got {text!r}")
+    parts = values.split(':')
+    if len(parts) > 1:
+        if PARAMS[name] is not float or len(parts) > 3 or parts[2:] not in ([], ['log']):
+            raise argparse.ArgumentTypeError(f"bad range {values!r} for {name}")
+        return name, (float(parts[0]), float(parts[1]), parts[2:] == ['log'])
+    return name, [PARAMS[name](v) for v in values.split(',')]
+
+
+def grid_trials(space):
+    names = list(space)
+    for name in names:
+        if isinstance(space[name], tuple):
+            raise ValueError(f"{name} is a range; ranges need --random")
+    return [dict(DEFAULTS, **dict(zip(names, values)))
+            for values in itertools.product(*(space[n] for n in names))]
+
+
+def random_trials(space, n, rng):
+    trials = []
+    for _ in range(n):
+        trial = dict(DEFAULTS)
+        for name, values in space.items():
+            if isinstance(values, tuple):
+                low, high, log = values
+                trial[name] = (float(np.exp(rng.uniform(np.log(low), np.log(high)))) if log
+                               else float(rng.uniform(low, high)))
+            else:
+                trial[name] = values[rng.integers(len(values))]
+        trials.append(trial)
+    return trials
+
+
+def round_budgets(num_episodes, rounds, eta):
+    # Episodes trained by the end of each round: ..., E/eta^2, E/eta, E
+    return [max(1, int(num_episodes / eta ** k)) for k in range(rounds - 1, -1, -1)]
+
+
+def new_state(trial, seed_seq):
+    encoder = get_encoder(trial['encoder'])
+    env_rng, ql_rng = RandomStream(seed_seq).spawn(2)
+    return {
+        'q_table': np.zeros((encoder.n_states, 4)),
+        'epsilon': trial['epsilon'],
+        'env_rng': env_rng,
+        'ql_rng': ql_rng,
+        'episodes': 0,
+        'curve': [],        # (episodes, mean training reward of the last block)
+        'evaluations': [],  # (episodes, mean greedy score)
+    }
+
+
+def _advance(args):
+    # Trains one trial up to `target` episodes, then evaluates it greedily
+    index, trial, state, target, settings = args
+    frame_size_x, frame_size_y = parse_board(trial['board'])
+    env = SnakeGameEnv(frame_size_x, frame_size_y, trial['growing'],
+                       rng=state['env_rng'], encoder=trial['encoder'])
+    ql = QLearning(env.n_states, 4, q_table=state['q_table'], rng=state['ql_rng'],
+                   encoder_id=env.encoder.id,
+                   **dict({p: trial[p] for p in QL_PARAMS}, epsilon=state['epsilon']))
+    allowed_actions = [0, 1, 2, 3]
+    max_steps = settings['max_steps']
+    rewards = []
+    while state['episodes'] < target:
+        state_id = env.reset()
+        total_reward = 0.0
+        for _ in range(max_steps):
+            action = ql.choose_action(state_id, allowed_actions)
+            next_state, reward, game_over = env.step(action)
+            ql.update_q_table(state_id, action, reward, next_state)
+            state_id = next_state
+            total_reward += reward
+            if game_over:
+                break
+        state['episodes'] += 1
+        rewards.append(total_reward)
+        if len(rewards) == settings['curve_every']:
+            state['curve'].append((state['episodes'], sum(rewards) / len(rewards)))
+            rewards = []
+    state['epsilon'] = ql.epsilon
+
+    # Same evaluation episodes for every trial, so scores are comparable
+    greedy = greedy_actions(state['q_table'])
+    scores = [play_episode(greedy, trial['encoder'],
+                           np.random.SeedSequence(settings['eval_entropy'], spawn_key=(i,)),
+                           frame_size_x, frame_size_y, trial['growing'], max_steps)[0]
+              for i in range(settings['eval_episodes'])]
+    state['evaluations'].append((state['episodes'], float(np.mean(scores))))
+    return index, state
+
+
+def sweep(trials, num_episodes=2000, rounds=3, eta=3, eval_episodes=20, max_steps=2000,
+          curve_every=50, workers=None, seed=None, log=print):
+    # Returns one result dict per trial, best first
+    seed_seq = np.random.SeedSequence(seed)
+    trial_seeds = seed_seq.spawn(len(trials))
+    settings = {'max_steps': max_steps, 'curve_every': curve_every,
+                'eval_episodes': eval_episodes,
+                'eval_entropy': seed_seq.spawn(1)[0].generate_state(4).tolist()}
+    states = [new_state(trial, s) for trial, s in zip(trials, trial_seeds)]
+    stopped = [None] * len(trials)
+    active = list(range(len(trials)))
+    workers = workers or os.cpu_count() or 1
+    pool = mp.Pool(workers) if workers > 1 else None
+    try:
+        budgets = round_budgets(num_episodes, rounds, eta)
+        for n, target in enumerate(budgets):
+            tasks = [(i, trials[i], states[i], target, settings) for i in active]
+            results = pool.imap_unordered(_advance, tasks) if pool else map(_advance, tasks)
+            for i, state in results:
+                states[i] = state
+            active.sort(key=lambda i: -states[i]['evaluations'][-1][1])
+            log(f"round {n + 1}/{len(budgets)}: {len(active)} trials at {target} episodes, "
+                f"best score {states[active[0]]['evaluations'][-1][1]:.1f}")
+            if n < len(budgets) - 1:
+                keep = max(1, math.ceil(len(active) / eta))
+                for i in active[keep:]:
+                    stopped[i] = target
+                active = active[:keep]
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+    results = []
+    for i, trial in enumerate(trials):
+        state = states[i]
+        results.append({
+            'trial': i,
+            'params': trial,
+            'episodes': state['episodes'],
+            'score': state['evaluations'][-1][1],
+            'stopped_at': stopped[i],
+            'curve': state['curve'],
+            'evaluations': state['evaluations'],
+        })
+    # Trials that got further rank first, then by their last score
+    results.sort(key=lambda r: (-r['episodes'], -r['score']))
+    return results
+
+
+def format_results(results, names):
+    header = f"{'rank':>4} {'trial':>5} " + " ".join(f"{n:>13}" for n in names) + \
+             f" {'episodes':>9} {'score':>9}"
+    lines = [header]
+    for rank, r in enumerate(results, 1):
+        values = " ".join(f"{_show(r['params'][n]):>13}" for n in names)
+        lines.append(f"{rank:>4} {r['trial']:>5} {values} {r['episodes']:>9} {r['score']:>9.1f}")
+    return "\n".join(lines)
+
+
+def _show(value):
+    return f"{value:.4g}" if isinstance(value, float) else str(value)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Hyperparameter sweep with early stopping.")
+    parser.add_argument('--param', type=parse_param, action='append', default=[],
+                        help="NAME=v1,v2,... (grid or random choice) or NAME=low:high[:log] "
+                             f"(random search); NAME is one of {', '.join(PARAMS)}")
+    parser.add_argument('--random', type=int, default=None, metavar='N',
+                        help="sample N random trials instead of the full grid")
+    parser.add_argument('--episodes', type=int, default=2000,
+                        help="training episodes of the trials that run to the end (default: 2000)")
+    parser.add_argument('--rounds', type=int, default=3,
+                        help="successive halving rounds (default: 3)")
+    parser.add_argument('--eta', type=float, default=3,
+                        help="keep the best 1/eta trials after each round (default: 3)")
+    parser.add_argument('--eval-episodes', type=int, default=20,
+                        help="greedy episodes that score a trial after each round (default: 20)")
+    parser.add_argument('--max-steps', type=int, default=2000,
+                        help="step cap per training and evaluation episode (default: 2000)")
+    parser.add_argument('--curve-every', type=int, default=50,
+                        help="episodes per point of the learning curves (default: 50)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument('--seed', type=int, default=None,
+                        help="sweep seed; every trial gets its own seed derived from it")
+    parser.add_argument('--output', default='sweep_results.json',
+                        help="JSON file with every trial and its learning curve")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    space = dict(args.param)
+    try:
+        if args.random:
+            trials = random_trials(space, args.random, np.random.default_rng(args.seed))
+        else:
+            trials = grid_trials(space)
+        for trial in trials:
+            parse_board(trial['board'])
+            get_encoder(trial['encoder'])
+    except (ValueError, argparse.ArgumentTypeError) as e:
+        raise SystemExit(str(e))
+    print(f"{len(trials)} trials, up to {args.episodes} episodes each")
+    results = sweep(trials, args.episodes, args.rounds, args.eta, args.eval_episodes,
+                    args.max_steps, args.curve_every, args.workers, args.seed)
+    print(format_results(results, list(space) or ['alpha']))
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
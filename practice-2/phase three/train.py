@@ -0,0 +1,184 @@
+"""
+Snake Eater Headless Training
+Command line entry point for training or playing without editing SnakeGame.py
+Machine Learning Classes - University Carlos III of Madrid
+
+Usage (from the practice-2 folder):
+    python "phase three/train.py" --episodes 200000 --board 30x30 --no-render
+"""
+import argparse
+
+from SnakeGame import run
+from cli import parse_board
+from encoders import DEFAULT_ENCODER, ENCODERS
+from parallel_train import train_parallel
+from replay import train_replay
+from snake_kernel import train_jit
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Train or play the Q-learning snake.")
+    parser.add_argument('--episodes', type=int, default=5000,
+                        help="number of episodes to run (default: 5000)")
+    parser.add_argument('--board', type=parse_board, default=(300, 300),
+                        help="board size in cells, e.g. 30x30 (default: 30x30)")
+    parser.add_argument('--growing', action=argparse.BooleanOptionalAction, default=False,
+                        help="make the snake grow when it eats (default: off)")
+    parser.add_argument('--train', action=argparse.BooleanOptionalAction, default=True,
+                        help="update the Q-table (use --no-train to only play)")
+    parser.add_argument('--render', action=argparse.BooleanOptionalAction, default=False,
+                        help="show the game window; imports pygame (default: off)")
+    parser.add_argument('--fps', type=int, default=75,
+                        help="frame rate cap when rendering (default: 75)")
+    parser.add_argument('--render-every', type=int, default=1,
+                        help="with --render, show only every Nth episode (default: 1)")
+    parser.add_argument('--frame-skip', type=int, default=1,
+                        help="with --render, draw only every Nth frame of a shown episode (default: 1)")
+    parser.add_argument('--full-redraw', action='store_true',
+                        help="with --render, redraw the whole window on every frame")
+    parser.add_argument('--policy', default=None,
+                        help="play a policy compiled by policy.py instead of the Q-table")
+    parser.add_argument('--encoder', choices=sorted(ENCODERS), default=DEFAULT_ENCODER,
+                        help=f"state encoding; sets the number of states (default: {DEFAULT_ENCODER})")
+    parser.add_argument('--q-table', default="phase three/q_table.bin",
+                        help="Q-table file to load and save")
+    parser.add_argument('--log-every', type=int, default=1,
+                        help="print the total reward every N episodes (default: 1)")
+    parser.add_argument('--checkpoint-every', type=int, default=1,
+                        help="save the Q-table every N episodes (default: 1)")
+    parser.add_argument('--checkpoint-seconds', type=float, default=None,
+                        help="also save the Q-table every T seconds")
+    parser.add_argument('--keep-checkpoints', type=int, default=0,
+                        help="keep the last K checkpoints next to the Q-table for rollback")
+    parser.add_argument('--record', default=None, metavar='LOG',
+                        help="append every episode to this log for episode_log.py")
+    parser.add_argument('--record-states', action='store_true',
+                        help="with --record, also store the state of every step")
+    parser.add_argument('--record-rewards', action='store_true',
+                        help="with --record, also store the reward of every step")
+    parser.add_argument('--converge-td', type=float, default=None, metavar='TOL',
+                        help="stop when the mean |TD error| over --converge-window episodes is below TOL")
+    parser.add_argument('--converge-window', type=int, default=100,
+                        help="episodes averaged for --converge-td (default: 100)")
+    parser.add_argument('--converge-patience', type=int, default=None, metavar='N',
+                        help="stop when the greedy score has not improved in N evaluations")
+    parser.add_argument('--converge-min-delta', type=float, default=0.0,
+                        help="smallest greedy score gain that counts as improving (default: 0)")
+    parser.add_argument('--eval-every', type=int, default=100,
+                        help="with --converge-*, evaluate the greedy policy every N episodes "
+                             "(default: 100, 0 disables)")
+    parser.add_argument('--eval-episodes', type=int, default=20,
+                        help="seeded games per greedy evaluation (default: 20)")
+    parser.add_argument('--min-episodes', type=int, default=0,
+                        help="with --converge-*, never stop before N episodes")
+    parser.add_argument('--profile', action='store_true',
+                        help="time every phase of the training loop")
+    parser.add_argument('--profile-every', type=int, default=0,
+                        help="print the timing summary every N episodes")
+    parser.add_argument('--profile-out', default=None,
+                        help="write the final timings as JSON to this file")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="train with N processes sharing one Q-table (default: 1)")
+    parser.add_argument('--seed', type=int, default=None,
+                        help="random seed; the same seed replays the same run")
+    parser.add_argument('--jit', action='store_true',
+                        help="run whole episodes in the compiled kernel (Numba, if installed)")
+    parser.add_argument('--max-steps', type=int, default=100000,
+                        help="step cap per episode with --jit (default: 100000)")
+    parser.add_argument('--replay', action='store_true',
+                        help="act in --envs vectorized games and learn from a replay buffer")
+    parser.add_argument('--envs', type=int, default=64,
+                        help="number of games stepped together with --replay (default: 64)")
+    parser.add_argument('--batch-size', type=int, default=256,
+                        help="minibatch size with --replay (default: 256)")
+    parser.add_argument('--replay-capacity', type=int, default=100000,
+                        help="transitions kept in the replay buffer (default: 100000)")
+    parser.add_argument('--updates-per-step', type=int, default=1,
+                        help="minibatch updates per vectorized step (default: 1)")
+    parser.add_argument('--dtype', choices=('float64', 'float32', 'float16'), default='float64',
+                        help="Q-value precision (default: float64)")
+    parser.add_argument('--sparse', action='store_true',
+                        help="only store the Q-values of states that were updated")
+    parser.add_argument('--alpha', type=float, default=0.1, help="learning rate")
+    parser.add_argument('--gamma', type=float, default=0.99, help="discount factor")
+    parser.add_argument('--epsilon', type=float, default=0.7, help="initial exploration rate")
+    parser.add_argument('--epsilon-min', type=float, default=0.01, help="exploration floor")
+    parser.add_argument('--epsilon-decay', type=float, default=0.995,
+                        help="multiplicative epsilon decay per action")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    frame_size_x, frame_size_y = args.board
+    ql_params = dict(alpha=args.alpha, gamma=args.gamma, epsilon=args.epsilon,
+                     epsilon_min=args.epsilon_min, epsilon_decay=args.epsilon_decay,
+                     dtype=args.dtype, sparse=args.sparse)
+    if args.sparse and (args.jit or args.replay or args.workers > 1):
+        raise SystemExit("--sparse only works with the single-process training loop")
+    if args.policy and (args.train or args.jit or args.replay or args.workers > 1):
+        raise SystemExit("--policy only plays; use it with --no-train and the single-process loop")
+    if args.encoder != 'phase_three' and args.jit:
+        raise SystemExit("--jit only supports the phase_three encoder")
+    if args.record and (args.jit or args.replay or args.workers > 1):
+        raise SystemExit("--record only works with the single-process training loop")
+    converge = args.converge_td is not None or args.converge_patience is not None
+    if converge and (args.jit or args.replay or args.workers > 1 or not args.train):
+        raise SystemExit("--converge-td/--converge-patience only work with the single-process training loop")
+    if args.converge_patience is not None and not args.eval_every:
+        raise SystemExit("--converge-patience needs greedy evaluations (--eval-every > 0)")
+    if args.jit:
+        if args.render or not args.train or args.profile or args.workers > 1 or args.replay:
+            raise SystemExit("--jit only supports headless single-process training without --profile")
+        train_jit(num_episodes=args.episodes,
+                  frame_size_x=frame_size_x, frame_size_y=frame_size_y,
+                  growing_body=args.growing, q_table_file=args.q_table, log_every=args.log_every,
+                  checkpoint_every=args.checkpoint_every,
+                  checkpoint_seconds=args.checkpoint_seconds,
+                  keep_checkpoints=args.keep_checkpoints, seed=args.seed,
+                  max_steps=args.max_steps, **ql_params)
+        return
+    if args.replay:
+        if args.render or not args.train or args.profile or args.workers > 1:
+            raise SystemExit("--replay only supports headless single-process training without --profile")
+        train_replay(args.envs, num_episodes=args.episodes,
+                     frame_size_x=frame_size_x, frame_size_y=frame_size_y,
+                     growing_body=args.growing, encoder=args.encoder,
+                     q_table_file=args.q_table, log_every=args.log_every,
+                     checkpoint_every=args.checkpoint_every,
+                     checkpoint_seconds=args.checkpoint_seconds,
+                     keep_checkpoints=args.keep_checkpoints, seed=args.seed,
+                     batch_size=args.batch_size, replay_capacity=args.replay_capacity,
+                     updates_per_step=args.updates_per_step, **ql_params)
+        return
+    if args.workers > 1:
+        if args.render or not args.train or args.profile:
+            raise SystemExit("--workers only supports headless training without --profile")
+        train_parallel(args.workers, num_episodes=args.episodes,
+                       frame_size_x=frame_size_x, frame_size_y=frame_size_y,
+                       growing_body=args.growing, encoder=args.encoder,
+                       q_table_file=args.q_table, log_every=args.log_every,
+                       checkpoint_every=args.checkpoint_every,
+                       checkpoint_seconds=args.checkpoint_seconds,
+                       keep_checkpoints=args.keep_checkpoints,
+                       seed=args.seed, **ql_params)
+        return
+    run(training=args.train, render_game=args.render, num_episodes=args.episodes,
+        frame_size_x=frame_size_x, frame_size_y=frame_size_y,
+        growing_body=args.growing, difficulty=args.fps,
+        encoder=args.encoder, q_table_file=args.q_table,
+        log_every=args.log_every, checkpoint_every=args.checkpoint_every,
+        checkpoint_seconds=args.checkpoint_seconds, keep_checkpoints=args.keep_checkpoints,
+        seed=args.seed, profile=args.profile, profile_every=args.profile_every,
+        profile_out=args.profile_out, render_every_episodes=args.render_every,
+        render_every_frames=args.frame_skip, dirty_rects=not args.full_redraw,
+        record_file=args.record, record_states=args.record_states,
+        record_rewards=args.record_rewards, policy_file=args.policy,
+        converge_td=args.converge_td, converge_window=args.converge_window,
+        converge_patience=args.converge_patience, converge_min_delta=args.converge_min_delta,
+        eval_every=args.eval_every, eval_episodes=args.eval_episodes,
+        min_episodes=args.min_episodes, **ql_params)
+
+
+if __name__ == "__main__":
+    main()
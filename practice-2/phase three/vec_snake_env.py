@@ -0,0 +1,189 @@
+"""
+Snake Eater Vectorized Environment
+Runs many independent SnakeGameEnv games as NumPy arrays
+Machine Learning Classes - University Carlos III of Madrid
+"""
+import numpy as np
+
+from encoders import DEFAULT_ENCODER, get_encoder
+
+# Actions use the same codes as SnakeGameEnv: 0=UP, 1=DOWN, 2=LEFT, 3=RIGHT.
+# The opposite of an action is always action ^ 1.
+ACTION_DX = np.array([0, 0, -1, 1], dtype=np.int64)
+ACTION_DY = np.array([-1, 1, 0, 0], dtype=np.int64)
+# Direction code used inside the state (UP=0, RIGHT=1, DOWN=2, LEFT=3)
+ACTION_TO_STATE_DIR = np.array([0, 2, 3, 1], dtype=np.int64)
+RIGHT = 3
+
+
+class VecSnakeEnv:
+    def __init__(self, n_envs, frame_size_x=150, frame_size_y=150, growing_body=True, seed=None,
+                 encoder=DEFAULT_ENCODER):
+        # Initializes n_envs games that are stepped together.
+        # Positions are kept in cell units (pixels // 10) internally.
+        # seed: int, SeedSequence or None, as accepted by np.random.default_rng
+        # encoder: name of a registered state encoder (see encoders.py)
+        self.n_envs = n_envs
+        self.encoder = get_encoder(encoder)
+        self.n_states = self.encoder.n_states
+        self.frame_size_x = frame_size_x
+        self.frame_size_y = frame_size_y
+        self.growing_body = growing_body
+        self.cells_x = frame_size_x // 10
+        self.cells_y = frame_size_y // 10
+        self.rng = np.random.default_rng(seed)
+
+        # The body is a ring buffer per game; the head lives at body_start
+        # and the tail at body_start + body_len - 1 (mod capacity).
+        self.capacity = self.cells_x * self.cells_y + 2
+        self.body = np.zeros((n_envs, self.capacity, 2), dtype=np.int64)
+        self.body_start = np.zeros(n_envs, dtype=np.int64)
+        self.body_len = np.zeros(n_envs, dtype=np.int64)
+        # Number of body segments on every cell, used for O(1) collision checks
+        self.occupancy = np.zeros((n_envs, self.cells_x, self.cells_y), dtype=np.uint8)
+
+        self.head = np.zeros((n_envs, 2), dtype=np.int64)
+        self.direction = np.zeros(n_envs, dtype=np.int64)
+        self.food = np.zeros((n_envs, 2), dtype=np.int64)
+        self.prev_dist = np.zeros(n_envs, dtype=np.int64)
+        self.score = np.zeros(n_envs, dtype=np.int64)
+        self.done = np.zeros(n_envs, dtype=bool)
+        self._rows = np.arange(n_envs)
+
+        self.states = self.reset()
+
+    def reset(self, mask=None):
+        # Resets the games selected by mask (all of them by default)
+        # and returns the current encoded state of every game.
+        if mask is None:
+            mask = np.ones(self.n_envs, dtype=bool)
+        idx = np.flatnonzero(mask)
+        n = idx.size
+        if n:
+            self.occupancy[idx] = 0
+            start = np.array([[5, 5], [6, 5], [7, 5]], dtype=np.int64)
+            self.body[idx, :3] = start
+            self.body_start[idx] = 0
+            self.body_len[idx] = 3
+            for x, y in start:
+                self.occupancy[idx, x, y] += 1
+            self.head[idx] = start[0]
+            self.direction[idx] = RIGHT
+            self.food[idx, 0] = self.rng.integers(1, self.cells_x, size=n)
+            self.food[idx, 1] = self.rng.integers(1, self.cells_y, size=n)
+            self.prev_dist[idx] = np.abs(self.head[idx] - self.food[idx]).sum(axis=1) * 10
+            self.score[idx] = 0
+            self.done[idx] = False
+        self.states = self._encode()
+        return self.states
+
+    def step(self, actions):
+        # Advances every game by one action.
+        # Returns (next_states, rewards, dones) exactly as SnakeGameEnv.step
+        # would for each game. Finished games are reset afterwards and their
+        # first state is available in self.states.
+        actions = np.asarray(actions, dtype=np.int64)
+        rows = self._rows
+
+        # Ignore actions that would reverse the snake
+        direction = np.where(actions == (self.direction ^ 1), self.direction, actions)
+        self.direction = direction
+        self.head[:, 0] += ACTION_DX[direction]
+        self.head[:, 1] += ACTION_DY[direction]
+        hx = self.head[:, 0]
+        hy = self.head[:, 1]
+        inside = (hx >= 0) & (hx < self.cells_x) & (hy >= 0) & (hy < self.cells_y)
+
+        # Push the new head
+        self.body_start = (self.body_start - 1) % self.capacity
+        self.body[rows, self.body_start] = self.head
+        self.body_len += 1
+        cx = np.clip(hx, 0, self.cells_x - 1)
+        cy = np.clip(hy, 0, self.cells_y - 1)
+        self.occupancy[rows, cx, cy] += inside.astype(np.uint8)
+
+        # Pop the tail unless the snake ate and keeps growing
+        ate = (hx == self.food[:, 0]) & (hy == self.food[:, 1])
+        self.score += np.where(ate, 10, 0)
+        pop = ~ate if self.growing_body else np.ones(self.n_envs, dtype=bool)
+        pop_rows = rows[pop]
+        tail = (self.body_start[pop] + self.body_len[pop] - 1) % self.capacity
+        tx = self.body[pop_rows, tail, 0]
+        ty = self.body[pop_rows, tail, 1]
+        self.occupancy[pop_rows, tx, ty] -= 1
+        self.body_len[pop] -= 1
+
+        # The head hits the body when its cell holds another segment
+        hit_body = inside & (self.occupancy[rows, cx, cy] > 1)
+        game_over = ~inside | hit_body
+
+        rewards = self._reward(ate, game_over)
+
+        # Respawn eaten food (SnakeGameEnv uses frame_size_x for both axes)
+        n_ate = int(ate.sum())
+        if n_ate:
+            self.food[ate, 0] = self.rng.integers(1, self.cells_x, size=n_ate)
+            self.food[ate, 1] = self.rng.integers(1, self.cells_x, size=n_ate)
+
+        next_states = self._encode()
+        self.done = game_over.copy()
+        if game_over.any():
+            self.states = self.reset(game_over)
+        else:
+            self.states = next_states
+        return next_states, rewards, game_over
+
+    def _reward(self, ate, game_over):
+        # Same shaping as SnakeGameEnv.calculate_reward
+        curr_dist = np.abs(self.head - self.food).sum(axis=1) * 10
+        delta = self.prev_dist - curr_dist
+        shaped = ~ate & ~game_over
+        self.prev_dist = np.where(shaped, curr_dist, self.prev_dist)
+
+        reward = np.sign(delta).astype(np.float64)
+        dx = ACTION_DX[self.direction]
+        dy = ACTION_DY[self.direction]
+        hx = self.head[:, 0]
+        hy = self.head[:, 1]
+        for px, py in ((hx + dx, hy + dy), (hx + dy, hy - dx), (hx - dy, hy + dx)):
+            reward -= self._outside(px, py)
+
+        reward = np.where(game_over, -30.0, reward)
+        reward = np.where(ate, 10.0, reward)
+        return reward
+
+    def _outside(self, px, py):
+        return (px < 0) | (px >= self.cells_x) | (py < 0) | (py >= self.cells_y)
+
+    def _occupied(self, px, py):
+        outside = self._outside(px, py)
+        cx = np.clip(px, 0, self.cells_x - 1)
+        cy = np.clip(py, 0, self.cells_y - 1)
+        return ~outside & (self.occupancy[self._rows, cx, cy] > 0)
+
+    def _encode(self):
+        # The encoder's array form of SnakeGameEnv.get_state, for every game
+        hx = self.head[:, 0]
+        hy = self.head[:, 1]
+        dx = ACTION_DX[self.direction]
+        dy = ACTION_DY[self.direction]
+        # The three "will I crash?" points: straight, right and left
+        sx, sy = hx + dx, hy + dy
+        rx, ry = hx + dy, hy - dx
+        lx, ly = hx - dy, hy + dx
+        fx = self.food[:, 0]
+        fy = self.food[:, 1]
+        return self.encoder.encode_arrays(
+            outside_s=self._outside(sx, sy), outside_r=self._outside(rx, ry),
+            outside_l=self._outside(lx, ly), occupied_s=self._occupied(sx, sy),
+            occupied_r=self._occupied(rx, ry), occupied_l=self._occupied(lx, ly),
+            head_x=hx, head_y=hy, fx=fx, fy=fy, dir_code=ACTION_TO_STATE_DIR[self.direction],
+            cell_dist=np.abs(hx - fx) + np.abs(hy - fy), length=self.body_len)
+
+    def get_body(self, i):
+        # Body of game i as a list of [x, y] pixel positions, head first
+        idx = (self.body_start[i] + np.arange(self.body_len[i])) % self.capacity
+        return (self.body[i, idx] * 10).tolist()
+
+    def get_food(self, i):
+        return (self.food[i] * 10).tolist()
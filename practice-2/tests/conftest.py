@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The phase three modules import each other by flat name, as when the
+# scripts are run from the practice-2 folder
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'phase three'))
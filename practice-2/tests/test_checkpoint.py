@@ -0,0 +1,58 @@
+"""
+CheckpointWriter shutdown
+
+After close() the writer thread is gone: Ctrl+C must reach the handler
+that was there before, and a late flush() must not wait for the thread.
+"""
+import os
+import signal
+
+import numpy as np
+import pytest
+
+from checkpoint import CheckpointWriter
+from q_table_io import read_table
+
+
+class FakeQLearning:
+    def __init__(self, filename):
+        self.q_table = np.zeros((8, 4))
+        self.filename = filename
+        self.encoder_id = 1
+
+
+def test_close_restores_sigint_handler(tmp_path):
+    ql = FakeQLearning(str(tmp_path / 'q_table.bin'))
+    previous = signal.getsignal(signal.SIGINT)
+    checkpoints = CheckpointWriter(ql)
+    checkpoints.install_signal_handler()
+    assert signal.getsignal(signal.SIGINT) is not previous
+    checkpoints.close()
+    assert signal.getsignal(signal.SIGINT) is previous
+    # Ctrl+C reaches the previous handler instead of hanging in flush()
+    with pytest.raises(KeyboardInterrupt):
+        os.kill(os.getpid(), signal.SIGINT)
+
+
+def test_flush_after_close_returns(tmp_path):
+    ql = FakeQLearning(str(tmp_path / 'q_table.bin'))
+    checkpoints = CheckpointWriter(ql)
+    ql.q_table[0, 0] = 1.0
+    checkpoints.close()
+    checkpoints.flush()
+    assert read_table(ql.filename, 8, 4, 1)[0, 0] == 1.0
+
+
+def test_final_flush_keeps_older_history(tmp_path):
+    ql = FakeQLearning(str(tmp_path / 'q_table.bin'))
+    checkpoints = CheckpointWriter(ql, every_episodes=10, keep=5)
+    for episode in range(1, 26):
+        ql.q_table[0, 0] = episode
+        checkpoints.episode_done(episode)
+        if episode % 10 == 0:
+            # Let the writer save this snapshot before the next one replaces it
+            checkpoints.flush()
+    checkpoints.close()
+    for episode in (10, 20, 25):
+        history = str(tmp_path / f'q_table.ep{episode:09d}.bin')
+        assert read_table(history, 8, 4, 1)[0, 0] == episode
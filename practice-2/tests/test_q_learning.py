@@ -0,0 +1,37 @@
+"""
+QLearning loading a table saved in the original text format
+
+Playing reads q_table.txt into memory and writes nothing; training
+converts it to q_table.bin once.
+"""
+import os
+
+import numpy as np
+
+from q_learning import QLearning
+from q_table_io import read_table
+
+
+def write_text_table(tmp_path):
+    table = np.arange(32, dtype=np.float64).reshape(8, 4)
+    np.savetxt(tmp_path / 'q_table.txt', table)
+    return table
+
+
+def test_playing_reads_text_table_without_writing(tmp_path):
+    table = write_text_table(tmp_path)
+    ql = QLearning(8, 4, filename=str(tmp_path / 'q_table.txt'), encoder_id=1)
+    np.testing.assert_array_equal(ql.q_table, table)
+    assert os.listdir(tmp_path) == ['q_table.txt']
+
+
+def test_training_converts_text_table_once(tmp_path):
+    table = write_text_table(tmp_path)
+    ql = QLearning(8, 4, filename=str(tmp_path / 'q_table.txt'), encoder_id=1,
+                   convert_text=True)
+    np.testing.assert_array_equal(ql.q_table, table)
+    np.testing.assert_array_equal(read_table(ql.filename, 8, 4, 1), table)
+    # the next run loads the binary table
+    os.remove(tmp_path / 'q_table.txt')
+    ql = QLearning(8, 4, filename=str(tmp_path / 'q_table.bin'), encoder_id=1)
+    np.testing.assert_array_equal(ql.q_table, table)
@@ -0,0 +1,40 @@
+"""
+Q-table loading for the read-only tools (evaluate.py, policy.py)
+
+load_table reads .bin and .txt tables the same way for every caller and
+never writes a file next to them.
+"""
+import os
+
+import numpy as np
+import pytest
+
+from encoders import get_encoder
+from q_table_io import load_table, save_table
+
+
+@pytest.fixture
+def table():
+    return np.random.default_rng(0).standard_normal((4096, 4))
+
+
+def test_binary_table_names_its_encoder(tmp_path, table):
+    filename = str(tmp_path / 'q_table.bin')
+    save_table(filename, table, get_encoder('phase_three').id)
+    loaded, encoder = load_table(filename, mmap=True)
+    assert encoder.name == 'phase_three'
+    np.testing.assert_array_equal(loaded, table)
+    with pytest.raises(ValueError, match='trained with encoder phase_three'):
+        load_table(filename, 'phase_two')
+
+
+def test_text_table_is_matched_by_rows(tmp_path, table):
+    filename = str(tmp_path / 'q_table.txt')
+    np.savetxt(filename, table)
+    loaded, encoder = load_table(filename)
+    assert encoder.name == 'phase_three'
+    np.testing.assert_allclose(loaded, table)
+    with pytest.raises(ValueError, match='has 4096 states'):
+        load_table(filename, 'phase_two')
+    # Nothing is converted next to the text table
+    assert os.listdir(tmp_path) == ['q_table.txt']
@@ -0,0 +1,77 @@
+"""
+Renderer dirty rects
+
+Redrawing only the cells that changed must leave the window exactly as a
+full redraw of the body and the food would, also when frames are skipped.
+"""
+import os
+import random
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+import pytest
+
+from renderer import BLACK, GREEN, RED, Renderer
+from rng import RandomStream
+from snake_env import DIR_DELTA, SnakeGameEnv
+
+SIZE = (100, 100)
+# Step cap per episode: the food seeking snake may circle forever
+STEPS = 500
+
+
+def full_redraw(body, food):
+    surface = pygame.Surface(SIZE)
+    surface.fill(BLACK)
+    for pos in body:
+        surface.fill(GREEN, (pos[0], pos[1], 10, 10))
+    surface.fill(RED, (food[0], food[1], 10, 10))
+    return pygame.image.tobytes(surface, 'RGB')
+
+
+ACTIONS = ['UP', 'DOWN', 'LEFT', 'RIGHT']
+OPPOSITE = {'UP': 'DOWN', 'DOWN': 'UP', 'LEFT': 'RIGHT', 'RIGHT': 'LEFT'}
+
+
+def seek_food(env, rng):
+    # Head for the food, avoiding walls and body where possible, so the
+    # snake grows and the episodes last
+    (x, y), (fx, fy) = env.snake_pos, env.get_food()
+    preferred = [0 if fy < y else 1, 2 if fx < x else 3]
+    if rng.random() < 0.2:
+        preferred.reverse()
+    order = preferred + [a for a in rng.sample(range(4), 4) if a not in preferred]
+    for action in order:
+        # turning back keeps the current direction
+        direction = ACTIONS[action]
+        if direction == OPPOSITE[env.direction]:
+            direction = env.direction
+        dx, dy = DIR_DELTA[direction]
+        cell = env._cell(x + dx, y + dy)
+        if cell >= 0 and not env.occupancy[cell]:
+            return action
+    return order[0]
+
+
+@pytest.mark.parametrize('every_frames', [1, 3, 10])
+def test_dirty_rects_match_full_redraw(every_frames):
+    renderer = Renderer(*SIZE, fps=0, every_frames=every_frames)
+    env = SnakeGameEnv(*SIZE, growing_body=True, rng=RandomStream(0))
+    actions = random.Random(0)
+    shown = longest = 0
+    for episode in range(10):
+        env.reset()
+        renderer.begin_episode(episode)
+        for step in range(STEPS):
+            _, _, done = env.step(seek_food(env, actions))
+            if done:
+                break
+            renderer.frame(env.get_body(), env.get_food())
+            if renderer._frame % every_frames == 0:
+                shown += 1
+                longest = max(longest, len(env.get_body()))
+                assert pygame.image.tobytes(renderer.window, 'RGB') == \
+                    full_redraw(env.get_body(), env.get_food()), f"episode {episode}"
+    assert shown > 100 and longest > 10
+    pygame.quit()
@@ -0,0 +1,50 @@
+"""
+SnakeGameEnv equivalence with the original environment
+
+data/snake_env_trajectories.json was recorded from the baseline
+snake_env.py (list body, separate get_state/calculate_reward/
+check_game_over) with seeded `random`: for every episode it holds the food
+positions drawn by random.randrange, the actions played and everything
+step() returned. Replaying the same actions and food draws must give the
+same states, rewards, done flags and scores.
+"""
+import json
+import os
+
+import pytest
+
+from snake_env import SnakeGameEnv
+
+with open(os.path.join(os.path.dirname(__file__), 'data', 'snake_env_trajectories.json')) as f:
+    TRAJECTORIES = json.load(f)
+
+
+class RecordedDraws:
+    # Stands in for RandomStream, handing out the recorded randrange values
+    def __init__(self, draws):
+        self.draws = iter(draws)
+
+    def randrange(self, low, high):
+        value = next(self.draws)
+        assert low <= value < high
+        return value
+
+
+@pytest.mark.parametrize('growing_body', [False, True])
+def test_covers_both_body_modes(growing_body):
+    assert any(t['growing_body'] == growing_body and len(t['actions']) > 50
+               for t in TRAJECTORIES)
+
+
+@pytest.mark.parametrize('index', range(len(TRAJECTORIES)))
+def test_replays_recorded_trajectory(index):
+    t = TRAJECTORIES[index]
+    env = SnakeGameEnv(t['frame_size'], t['frame_size'], t['growing_body'])
+    env.rng = RecordedDraws(t['draws'])
+    assert env.reset() == t['states'][0]
+    for i, action in enumerate(t['actions']):
+        state, reward, done = env.step(action)
+        assert (state, reward, done, env.score) == \
+            (t['states'][i + 1], t['rewards'][i], t['dones'][i], t['scores'][i]), f"step {i}"
+    # every food position the baseline drew was drawn again
+    assert next(env.rng.draws, None) is None
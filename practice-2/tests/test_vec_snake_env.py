@@ -0,0 +1,96 @@
+"""
+VecSnakeEnv against SnakeGameEnv, in lock step
+
+Every game of a VecSnakeEnv is mirrored by a SnakeGameEnv that is handed
+the same food positions: the batch's random draws are recorded and routed
+to the game they were drawn for. Both then play the same seeded random
+actions (reversals included) and must return the same state, reward and
+done flag at every step, through resets, for every encoder.
+"""
+from collections import deque
+
+import numpy as np
+import pytest
+
+from encoders import ENCODERS
+from snake_env import SnakeGameEnv
+from vec_snake_env import VecSnakeEnv
+
+N_ENVS = 32
+STEPS = 1000
+EAT_REWARD = 10
+
+
+class RecordingGenerator:
+    # Wraps the batch's np.random.Generator and keeps every integers() draw
+    def __init__(self, seed):
+        self.generator = np.random.default_rng(seed)
+        self.draws = []
+
+    def integers(self, low, high, size):
+        values = self.generator.integers(low, high, size=size)
+        self.draws.append((low, high, values))
+        return values
+
+
+class QueuedDraws:
+    # Stands in for RandomStream, handing out the food cells drawn for one
+    # game; both environments must draw them from the same range
+    def __init__(self):
+        self.queue = deque()
+
+    def randrange(self, low, high):
+        draw_low, draw_high, value = self.queue.popleft()
+        assert (low, high) == (draw_low, draw_high)
+        return int(value)
+
+
+def route(draws, rows, games):
+    # The batch draws x for every row, then y for every row
+    (x_low, x_high, xs), (y_low, y_high, ys) = next(draws), next(draws)
+    for x, y, i in zip(xs, ys, rows):
+        games[i].rng.queue.extend(((x_low, x_high, x), (y_low, y_high, y)))
+
+
+@pytest.mark.parametrize('encoder', sorted(ENCODERS))
+@pytest.mark.parametrize('growing_body', [False, True])
+@pytest.mark.parametrize('board', [(80, 80), (200, 120)])
+def test_vec_env_matches_snake_env(encoder, growing_body, board):
+    seed = sorted(ENCODERS).index(encoder) * 10 + growing_body
+    rng = RecordingGenerator(seed)
+    vec = VecSnakeEnv(N_ENVS, *board, growing_body, encoder=encoder)
+    # Replace the batch's generator and reset again to record the first food
+    vec.rng = rng
+    vec.reset()
+    games = [SnakeGameEnv(*board, growing_body, encoder=encoder) for _ in range(N_ENVS)]
+    for game in games:
+        game.rng = QueuedDraws()
+    route(iter(rng.draws), range(N_ENVS), games)
+    rng.draws.clear()
+    expected = [game.reset() for game in games]
+    assert vec.states.tolist() == expected
+
+    actions_rng = np.random.default_rng(seed)
+    ate_and_died = 0
+    for _ in range(STEPS):
+        actions = actions_rng.integers(0, 4, size=N_ENVS)
+        states, rewards, dones = vec.step(actions)
+        ate = rewards == EAT_REWARD
+        draws = iter(rng.draws)
+        # Food for the games that ate, then for the games that were reset
+        if ate.any():
+            route(draws, np.flatnonzero(ate), games)
+        if dones.any():
+            route(draws, np.flatnonzero(dones), games)
+        rng.draws.clear()
+        ate_and_died += int((ate & dones).sum())
+
+        for i, game in enumerate(games):
+            state, reward, done = game.step(int(actions[i]))
+            assert (states[i], rewards[i], dones[i]) == (state, reward, done), f"game {i}"
+            if done:
+                assert vec.states[i] == game.reset()
+            assert not game.rng.queue
+    assert vec.score.tolist() == [game.score for game in games]
+    # The batch covers the ends that are easy to get wrong
+    assert ate_and_died > 0